@@ -1,15 +1,27 @@
 file_path='C.h5'
 
 def load():
+	''' frozen, inference-only classifier, see fold '''
 	import keras
 	m = keras.models.load_model(file_path,None,False)
+	return fold(m)
+
+def fold(model):
+	''' same layers and weights without Dropout (identity at inference), not trainable '''
+	import keras
+	from keras.layers import Dropout, InputLayer
+	y = i = keras.layers.Input(model.input_shape[1:])
+	for layer in model.layers:
+		if not isinstance(layer,(Dropout,InputLayer)):
+			y = layer(y)
+	m = keras.models.Model(i,y,name=model.name)
 	m.trainable = False
 	return m
 
 def build():
 	# from https://github.com/keras-team/keras/blob/master/examples/mnist_cnn.py
 	import keras
-	from keras.datasets import mnist
+	import mnist_store
 	from keras.models import Sequential
 	from keras.layers import Dense, Dropout, Flatten
 	from keras.layers import Conv2D, MaxPooling2D
@@ -22,16 +34,12 @@ def build():
 	img_rows, img_cols = 28, 28
 
 	# the data, split between train and test sets
-	(x_train, y_train), (x_test, y_test) = mnist.load_data()
-	
-	x_train = x_train.reshape(x_train.shape[0], img_rows, img_cols, 1)
-	x_test = x_test.reshape(x_test.shape[0], img_rows, img_cols, 1)
+	train, test = mnist_store.load()
+	(x_train, y_train), (x_test, y_test) = (train.x, train.y), (test.x, test.y)
 	input_shape = (img_rows, img_cols, 1)
 
-	x_train = x_train.astype('float32')
-	x_test = x_test.astype('float32')
-	x_train /= 255
-	x_test /= 255
+	x_train = mnist_store.float32(x_train)
+	x_test = mnist_store.float32(x_test)
 	print('x_train shape:', x_train.shape)
 	print(x_train.shape[0], 'train samples')
 	print(x_test.shape[0], 'test samples')
@@ -1,4 +1,32 @@
+''' digit -> digit translation for any set of digit pairs
+
+python main.py 3-5          # the old M11/M15/M51/M55 run, now saved as M33/M35/M53/M55
+python main.py --all        # all 45 pairs
+
+one Encoder/Decoder per digit, every pair (both directions) lives in one
+model : each digit is encoded once per step, its code goes to its own decoder
+(auto) and to the decoder of every digit it is paired with (cross, judged by
+the frozen classifier), and all of it is one train_on_batch
+'''
 import keras
+import argparse
+import itertools
+
+parser = argparse.ArgumentParser()
+parser.add_argument("pairs", nargs='*', default=['3-5'], help="a-b digit pairs")
+parser.add_argument("--all", action='store_true', help="all 45 pairs")
+parser.add_argument("-r","--rounds", default=100, type=int)
+parser.add_argument("-b","--batch_size", default=128, type=int)
+parser.add_argument("-aw","--auto_weight", default=3.0, type=float)
+args = parser.parse_args()
+print(args)
+
+if args.all:
+	pairs = list(itertools.combinations(range(10),2))
+else:
+	pairs = [tuple(int(d) for d in p.split('-')) for p in args.pairs]
+directed = pairs + [(b,a) for a,b in pairs]
+digits = sorted({d for p in pairs for d in p})
 
 import classifier
 classifier = classifier.load()
@@ -7,88 +35,52 @@ from model import Encoder, Decoder, input_shape
 from keras.models import Model
 from keras.layers import Input
 
-from keras.datasets import mnist
+import mnist_store
 import numpy as np
-(x, y), _ = mnist.load_data()
-#x1 ,y1 = x[y==1], y[y==1] # y is full of 1 :P
-x=x.astype('float')/255
-x=x.reshape((-1,*input_shape))
-
-x_n = [x[y==i] for i in range(10)]
-
-X = x_n
-
-e1 = Encoder()
-d1 = Decoder()
-
-e5 = Encoder()
-d5 = Decoder()
-
-i1 = Input(input_shape)
-i5 = Input(input_shape)
-
-auto1 = d1(e1(i1))
-auto5 = d5(e5(i5))
-
-cross51 = d1(e5(i5))
-cross15 = d5(e1(i1))
-
-D15 = classifier(cross15)
-D51 = classifier(cross51)
-
-M11 = Model(i1,auto1)
-M15 = Model(i1,D15)
-M55 = Model(i5,auto5)
-M51 = Model(i5,D51)
-
-M11.compile(optimizer='RMSProp',loss='mse',metrics=['accuracy'])
-M55.compile(optimizer='RMSProp',loss='mse',metrics=['accuracy'])
-M15.compile(optimizer='RMSProp',loss='categorical_crossentropy',metrics=['accuracy'])
-M51.compile(optimizer='RMSProp',loss='categorical_crossentropy',metrics=['accuracy'])
+train, _ = mnist_store.load()
 
+X = [train.digit(i) for i in range(10)] # uint8 views
 
-yab = lambda a,b : np.tile(np.eye(10)[b],len(X[a])).reshape(-1,10)
+E = {d:Encoder() for d in digits}
+D = {d:Decoder() for d in digits}
+I = {d:Input(input_shape) for d in digits}
+Z = {d:E[d](I[d]) for d in digits}
 
-#from keras.preprocessing.image import ImageDataGenerator
+auto = {d:D[d](Z[d]) for d in digits}
+cross = {(a,b):D[b](Z[a]) for a,b in directed}
 
-#imG = ImageDataGenerator(width_shift_range=20,height_shift_range=20,fill_mode='constant',cval=0)
+M = Model([I[d] for d in digits], [auto[d] for d in digits] + [classifier(cross[p]) for p in directed])
+M.compile(optimizer='RMSProp',
+	loss=['mse']*len(digits) + ['sparse_categorical_crossentropy']*len(directed),
+	loss_weights=[args.auto_weight]*len(digits) + [1.0]*len(directed))
 
-x1 = X[3]
-x5 = X[5]
-y15 = yab(3,5)
-y51 = yab(5,3)
+batch_size = args.batch_size
+cross_targets = [np.full((batch_size,1),b) for a,b in directed] # class indices, sparse loss
 
-#G11 = img.flow(x1,x1,batch_size=256)
-#G55 = img.flow(x5,x5,batch_size=256)
-#G15 = img.flow(x1,y15,batch_size=256)
-#G51 = img.flow(x1,y15,batch_size=256)
+def batch():
+	''' a float32 batch per digit, converted from the uint8 store per step '''
+	x = [mnist_store.float32(X[d][np.sort(np.random.randint(len(X[d]),size=batch_size))]) for d in digits]
+	return x, x + cross_targets
 
-try:
-	M11.load_weights('auto1_Weight.h5')
-	M55.load_weights('auto5_Weight.h5')
-	print('load weight success')
-except:
-	print('load weight fail')
-	pass
+auto_models = {d:Model(I[d],auto[d]) for d in digits}
+for d in digits:
+	try:
+		auto_models[d].load_weights('auto{}_Weight.h5'.format(d))
+		print('load weight {} success'.format(d))
+	except (OSError,ValueError):
+		print('load weight {} fail'.format(d))
 
-print('version +1')
+steps = max(len(X[d]) for d in digits) // batch_size
 
-for i in range(100):
-	verbose = 1
-	auto_epoch = 3
-	cross_epoch = 1
+for i in range(args.rounds):
 	print()
 	print(' -- epoch {} -- '.format(i))
 	print()
-	M11.fit(x1,x1,batch_size=128, epochs=auto_epoch,verbose=verbose)
-	M55.fit(x5,x5,batch_size=128, epochs=auto_epoch,verbose=verbose)
-	M15.fit(x1,y15,batch_size=128, epochs=cross_epoch,verbose=verbose)
-	M51.fit(x5,y51,batch_size=128, epochs=cross_epoch,verbose=verbose)
-
-M11.save_weights('auto1_Weight.h5')
-M55.save_weights('auto5_Weight.h5')
-
-Model(i1,auto1).save('M11.h5')
-Model(i1,cross15).save('M15.h5')
-Model(i5,auto5).save('M55.h5')
-Model(i5,cross51).save('M51.h5')
\ No newline at end of file
+	losses = np.mean([M.train_on_batch(*batch()) for _ in range(steps)], axis=0)
+	print(' '.join('{}:{:.4f}'.format(n,l) for n,l in zip(M.metrics_names,losses)))
+
+for d in digits:
+	auto_models[d].save_weights('auto{}_Weight.h5'.format(d))
+	auto_models[d].save('M{}{}.h5'.format(d,d))
+for a,b in directed:
+	Model(I[a],cross[(a,b)]).save('M{}{}.h5'.format(a,b))
@@ -0,0 +1,49 @@
+''' one on-disk uint8 copy of mnist for every script, memory-mapped
+
+images are stored sorted by digit with class offsets, so split.digit(i) is a
+zero-copy view (x[y==i] makes a copy per class) ; convert to float32 only what
+is about to be used with float32(...)
+
+DCGAN/mnist_store.py is the same file, both use the same store
+'''
+import os
+import numpy as np
+
+root = os.path.join(os.path.expanduser('~'), '.keras', 'datasets', 'mnist_store')
+
+class Split:
+	def __init__(self, name):
+		path = lambda k: os.path.join(root, '{}_{}.npy'.format(name, k))
+		self.x = np.load(path('x'), mmap_mode='r')
+		self.y = np.load(path('y'), mmap_mode='r')
+		self.offsets = np.load(path('offsets'))
+
+	def __len__(self):
+		return len(self.y)
+
+	def digit(self, i):
+		''' uint8 images of digit *i*, a view '''
+		return self.x[self.offsets[i]:self.offsets[i+1]]
+
+def float32(x):
+	''' uint8 (n,28,28) -> float32 (n,28,28,1) in [0,1] '''
+	return np.multiply(x, np.float32(1/255), dtype=np.float32).reshape((-1,28,28,1))
+
+def build():
+	''' write the store from keras' mnist.npz (temp files, then rename) '''
+	from keras.datasets import mnist
+	os.makedirs(root, exist_ok=True)
+	for name,(x,y) in zip(['train','test'], mnist.load_data()):
+		order = np.argsort(y, kind='stable')
+		offsets = np.searchsorted(y[order], np.arange(11))
+		for k,v in [('x',x[order]), ('y',y[order].astype(np.uint8)), ('offsets',offsets)]:
+			path = os.path.join(root, '{}_{}.npy'.format(name, k))
+			tmp = '{}.{}.tmp.npy'.format(path, os.getpid())
+			np.save(tmp, v)
+			os.replace(tmp, path)
+
+def load():
+	''' (train, test) Splits, the store is built on first use '''
+	if not os.path.exists(os.path.join(root, 'test_offsets.npy')):
+		build()
+	return Split('train'), Split('test')
@@ -1,46 +1,38 @@
 import keras
 
-from keras.datasets import mnist
 from keras.models import load_model
 
 import numpy as np
 import cv2
+import mnist_store
 
 small = True
 sc = 100
 
-(x, y), _ = mnist.load_data()
-x=x.astype('float')/255
-x=x.reshape((-1,28,28,1))
+train, _ = mnist_store.load()
 if not small:
-	x_n = *(x[y==i] for i in range(10)),
+	x_n = *(mnist_store.float32(train.digit(i)) for i in range(10)),
 else:
-	x_n = *(x[y==i][:sc] for i in range(10)),
+	x_n = *(mnist_store.float32(train.digit(i)[:sc]) for i in range(10)),
 X = x_n
 
 
 
-M11 = load_model('M11.h5',compile=False)
-M15 = load_model('M15.h5',compile=False)
-M51 = load_model('M51.h5',compile=False)
-M55 = load_model('M55.h5',compile=False)
+a,b = 3,5 # the pair main.py was run with
+
+Maa = load_model('M{}{}.h5'.format(a,a),compile=False)
+Mab = load_model('M{}{}.h5'.format(a,b),compile=False)
+Mba = load_model('M{}{}.h5'.format(b,a),compile=False)
+Mbb = load_model('M{}{}.h5'.format(b,b),compile=False)
 
 pretty = lambda im: im.reshape((28,28))*255
 
 import os
-os.makedirs('test/1')
-p11 = M11.predict(X[3])
-p15 = M15.predict(X[3])
-for i,(x1,y1,y5) in enumerate(zip(X[3],p11,p15)):
-	cv2.imwrite('test/1/{}-1{}.png'.format(i,'o'),pretty(x1))
-	cv2.imwrite('test/1/{}-2{}.png'.format(i,'r'),pretty(y1))
-	cv2.imwrite('test/1/{}-3{}.png'.format(i,'t'),pretty(y5))
-
-os.makedirs('test/5')
-p55 = M55.predict(X[5])
-p51 = M51.predict(X[5])
-for i,(x1,y1,y5) in enumerate(zip(X[5],p55,p51)):
-	cv2.imwrite('test/5/{}-1{}.png'.format(i,'o'),pretty(x1))
-	cv2.imwrite('test/5/{}-2{}.png'.format(i,'r'),pretty(y1))
-	cv2.imwrite('test/5/{}-3{}.png'.format(i,'t'),pretty(y5))
-	
\ No newline at end of file
+for d,auto,cross in [(a,Maa,Mab),(b,Mbb,Mba)]:
+	os.makedirs('test/{}'.format(d),exist_ok=True)
+	pa = auto.predict(X[d])
+	pc = cross.predict(X[d])
+	for i,(x1,y1,y5) in enumerate(zip(X[d],pa,pc)):
+		cv2.imwrite('test/{}/{}-1{}.png'.format(d,i,'o'),pretty(x1))
+		cv2.imwrite('test/{}/{}-2{}.png'.format(d,i,'r'),pretty(y1))
+		cv2.imwrite('test/{}/{}-3{}.png'.format(d,i,'t'),pretty(y5))
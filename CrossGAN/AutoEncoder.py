@@ -3,12 +3,12 @@ import keras_contrib
 
 class AutoEncoder():
 	''' autoencoder + discriminator, all trainable'''
-	def __init__(self,name):
+	def __init__(self,name,size=128):
 
 		#parameters
 		self.name = name
-		self.width = 128
-		self.height = 128
+		self.width = size
+		self.height = size
 		# parameter for [encoder, decoder]
 		self.deeps = [[32,64,128,256],[128,64,32,3]]
 		self.nres = [3,3]
@@ -32,14 +32,29 @@ class AutoEncoder():
 		self.autoencoder = keras.models.Model(self.i,self.o)
 		self.fullmodel = keras.models.Model(self.i,self.d)
 
-	def save(self):
-		''' save weights to {self.name} '''
-		self.fullmodel.save_weights(self.name+'.h5')
+	def save(self,writer=None):
+		''' save weights to {self.name}, in the background if *writer* is given '''
+		if writer is None:
+			self.fullmodel.save_weights(self.name+'.h5')
+		else:
+			from Writer import snapshot_weights,write_weights
+			writer.submit(write_weights, self.name+'.h5', snapshot_weights(self.fullmodel))
 	
 	def load(self):
 		''' load weights from {self.name} '''
 		self.fullmodel.load_weights(self.name+'.h5')
 
+	def copy_weights(self,other):
+		''' take weights from *other* AutoEncoder, possibly built at another size
+		encoder and decoder are fully convolutional so every layer fits,
+		layers whose shapes changed (the discriminator's Dense) keep their fresh init '''
+		pairs = [(self.encoder,other.encoder),(self.decoder,other.decoder),(self.discriminator,other.discriminator)]
+		for dst,src in pairs:
+			for d,s in zip(dst.layers,src.layers):
+				w = s.get_weights()
+				if [x.shape for x in w] == [x.shape for x in d.get_weights()]:
+					d.set_weights(w)
+
 	def newEncoder(self):
 		''' brand new encoder '''
 		
@@ -0,0 +1,62 @@
+import glob
+import os
+import pickle
+import tempfile
+
+class Checkpointer:
+	''' numbered checkpoints in *dir*, written atomically, only the last *keep* are kept '''
+	def __init__(self, dir, keep = 3):
+		self.dir = dir
+		self.keep = keep
+
+	def path(self, round):
+		return os.path.join(self.dir, 'ckpt-{:08d}.pkl'.format(round))
+
+	def files(self):
+		''' existing checkpoints, oldest first '''
+		return sorted(glob.glob(os.path.join(self.dir, 'ckpt-*.pkl')))
+
+	def save(self, round, state, writer = None):
+		''' write *state* (already copied, plain python / numpy) for *round*, in the background if *writer* is given '''
+		if writer is None:
+			self._write(round, state)
+		else:
+			writer.submit(self._write, round, state)
+
+	def latest(self):
+		''' the newest checkpoint state, or None '''
+		files = self.files()
+		if not files:
+			return None
+		with open(files[-1], 'rb') as f:
+			return pickle.load(f)
+
+	def _write(self, round, state):
+		os.makedirs(self.dir, exist_ok = True)
+		path = self.path(round)
+		fd, tmp = tempfile.mkstemp(prefix = os.path.basename(path) + '.', suffix = '.tmp', dir = self.dir)
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(tmp, path)
+		except BaseException:
+			os.remove(tmp)
+			raise
+		for old in self.files()[:-self.keep]:
+			try:
+				os.remove(old)
+			except FileNotFoundError:
+				pass
+
+def optimizer_state(model):
+	''' copy of the optimizer slots of a compiled *model*, empty before the first update '''
+	from keras import backend as K
+	return K.batch_get_value(model.optimizer.weights)
+
+def set_optimizer_state(model, values):
+	if not values:
+		return
+	model._make_train_function() # optimizer slots are created with the train function
+	model.optimizer.set_weights(values)
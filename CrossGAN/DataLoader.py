@@ -1,28 +1,34 @@
 import cv2
-import glob
 import numpy
+import queue
+import time
+from DirIndex import DirIndex
 
 class DataLoader:
 	''' load data '''
 	def __init__(self, dir, size = None):
 		self.dir = dir
 		self.size = size
-		self.files = glob.glob(dir + '/*')
+		self.files = DirIndex(dir).files()
 		print('loadfrom {}, find {} files'.format(dir+'/*',len(self.files)))
 
-	def load(self,batch_size):
-		''' return a batch of data '''
+	def load(self,batch_size,out = None):
+		''' return a batch of float32 data, written into *out* if given '''
 		ch = numpy.random.choice(self.files, batch_size)
-		return numpy.stack([self.imread(f) for f in ch])
+		ims = [self.imread(f) for f in ch]
+		if out is None:
+			out = numpy.empty((batch_size,) + ims[0].shape, numpy.float32)
+		for o,im in zip(out,ims):
+			normalize(im, out = o)
+		return out
 
 	def imread(self,file):
-		''' read and preprocess images from file '''
+		''' read and resize image from file, still uint8 '''
 		im = cv2.imread(file)
 		if im is None:
 			raise RuntimeError('{} is not image'.format(file))
 		if self.size:
 			im = cv2.resize(im,dsize = self.size)
-		im = im.astype('float')/255
 		return im
 	
 	@staticmethod
@@ -32,11 +38,140 @@ class DataLoader:
 		img = img.reshape(img.shape[1:])
 		cv2.imwrite(file,img)
 
+def normalize(im, out = None):
+	''' uint8 [0,255] -> float32 [0,1], no float64 temporaries '''
+	return numpy.multiply(im, numpy.float32(1/255), out = out, dtype = numpy.float32)
+
+class Prefetcher:
+	''' wrap a loader, decode upcoming batches of *batch_size* in background workers
+	drop-in for loader.load and loader.load_indexed, other batch sizes fall back to the
+	wrapped loader ; with no *batch_size* the workers start on the first load and
+	prefetch that size '''
+	def __init__(self, loader, batch_size = None, workers = 2, depth = 4, processes = False):
+		self.loader = loader
+		self.batch_size = None
+		self.nworkers = workers
+		self.depth = depth
+		self.processes = processes
+		self.indexed = hasattr(loader, 'load_indexed')
+		self.wait_times = []
+		self.workers = []
+		if batch_size is not None:
+			self.start(batch_size)
+
+	def start(self, batch_size):
+		self.batch_size = batch_size
+		if self.processes:
+			import multiprocessing
+			self.queue = multiprocessing.Queue(self.depth)
+			self.stop = multiprocessing.Event()
+			Worker = multiprocessing.Process
+		else:
+			import threading
+			self.queue = queue.Queue(self.depth)
+			self.stop = threading.Event()
+			Worker = threading.Thread
+
+		args = (self.loader, batch_size, self.queue, self.stop, self.processes, self.indexed)
+		self.workers = [Worker(target = _prefetch, args = args, daemon = True) for _ in range(self.nworkers)]
+		for w in self.workers:
+			w.start()
+
+	def __getattr__(self, name):
+		return getattr(self.loader, name)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def get(self):
+		''' next (ids, batch) from the workers, record how long we waited for it '''
+		start = time.perf_counter()
+		while True:
+			try:
+				item = self.queue.get(timeout = 1)
+				break
+			except queue.Empty:
+				if not any(w.is_alive() for w in self.workers):
+					raise RuntimeError('all prefetch workers died')
+		self.wait_times.append(time.perf_counter() - start)
+		return item
+
+	def load(self, batch_size, out = None):
+		''' return a batch of float32 data, copied into *out* if given '''
+		if self.batch_size is None:
+			self.start(batch_size)
+		if batch_size != self.batch_size:
+			return self.loader.load(batch_size, out)
+		batch = self.get()[1]
+		if out is None:
+			return batch
+		out[...] = batch
+		return out
+
+	def load_indexed(self, batch_size, out = None):
+		''' (image indices, batch), only if the wrapped loader has load_indexed '''
+		if not self.indexed:
+			raise AttributeError('{} has no load_indexed'.format(type(self.loader).__name__))
+		if self.batch_size is None:
+			self.start(batch_size)
+		if batch_size != self.batch_size:
+			return self.loader.load_indexed(batch_size, out)
+		ids, batch = self.get()
+		if out is None:
+			return ids, batch
+		out[...] = batch
+		return ids, out
+
+	def report(self):
+		''' (count, mean, max) of waits in seconds '''
+		w = self.wait_times
+		if not w:
+			return 0, 0.0, 0.0
+		return len(w), sum(w)/len(w), max(w)
+
+	def close(self):
+		''' stop workers, drop queued batches '''
+		if not self.workers:
+			return
+		self.stop.set()
+		for w in self.workers:
+			while w.is_alive():
+				try:
+					while True:
+						self.queue.get_nowait()
+				except queue.Empty:
+					pass
+				w.join(timeout = 0.1)
+		self.workers = []
+		print('prefetch {} batches, wait mean {:.4f}s max {:.4f}s'.format(*self.report()))
+
+def _prefetch(loader, batch_size, q, stop, processes, indexed):
+	''' worker : fill *q* with (ids, batch) until *stop* is set, ids is None without load_indexed '''
+	if processes:
+		numpy.random.seed() # forked workers share the parent's random state
+		q.cancel_join_thread()
+	while not stop.is_set():
+		item = loader.load_indexed(batch_size) if indexed else (None, loader.load(batch_size))
+		while not stop.is_set():
+			try:
+				q.put(item, timeout = 0.1)
+				break
+			except queue.Full:
+				pass
+
 def test():
 	l = DataLoader('testim',(64,64))
 	data = l.load(20)
 	for i,im in enumerate(data):
 		DataLoader.save_image(im,file = 'testimo/{}.png'.format(i))
 
+def test_prefetch():
+	with Prefetcher(DataLoader('testim',(64,64)), 20) as l:
+		for _ in range(10):
+			l.load(20)
+
 if __name__ == '__main__':
-	test()
\ No newline at end of file
+	test()
@@ -0,0 +1,84 @@
+import json
+import os
+
+# formats PIL can name from the header that cv2.imread can also decode
+readable = {'JPEG','PNG','BMP','TIFF','WEBP','PPM','JPEG2000'}
+
+class DirIndex:
+	''' persistent index of an image directory, saved next to it as {dir}.index.json
+	name -> [size, mtime_ns, height, width, valid], only new or changed files are probed '''
+	def __init__(self, dir, workers = 8):
+		self.dir = os.path.normpath(dir)
+		self.path = self.dir + '.index.json'
+		self.entries = self.read()
+		self.refresh(workers)
+
+	def __len__(self):
+		return len(self.entries)
+
+	def read(self):
+		try:
+			with open(self.path) as f:
+				return json.load(f)
+		except (OSError,ValueError):
+			return {}
+
+	def write(self):
+		''' best effort : on a read-only mount the index stays in memory and is rebuilt next time '''
+		tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+		try:
+			with open(tmp, 'w') as f:
+				json.dump(self.entries, f)
+			os.replace(tmp, self.path)
+		except OSError as e:
+			print('index {} not saved : {}'.format(self.path, e))
+			try:
+				os.remove(tmp)
+			except OSError:
+				pass
+
+	def refresh(self, workers = 8):
+		''' rescan the directory, probe new or changed files in parallel, drop removed ones '''
+		from concurrent.futures import ThreadPoolExecutor
+		seen, changed = set(), []
+		with os.scandir(self.dir) as it:
+			for e in it:
+				if not e.is_file():
+					continue
+				seen.add(e.name)
+				st = e.stat()
+				old = self.entries.get(e.name)
+				if old is None or old[0] != st.st_size or old[1] != st.st_mtime_ns:
+					changed.append((e.name, st.st_size, st.st_mtime_ns))
+		removed = set(self.entries) - seen
+		for name in removed:
+			del self.entries[name]
+		if changed:
+			with ThreadPoolExecutor(workers) as pool:
+				shapes = pool.map(probe, (os.path.join(self.dir, name) for name,_,_ in changed))
+				for (name,size,mtime),(h,w,valid) in zip(changed, shapes):
+					self.entries[name] = [size, mtime, h, w, valid]
+		if changed or removed:
+			bad = sum(1 for name,_,_ in changed if not self.entries[name][4])
+			print('index {} : {} probed, {} removed, {} not image'.format(self.path, len(changed), len(removed), bad))
+			self.write()
+
+	def files(self):
+		''' sorted paths of valid images '''
+		return [os.path.join(self.dir, name) for name in sorted(self.entries) if self.entries[name][4]]
+
+def probe(file):
+	''' (height, width, valid) from the image header, full decode if PIL is missing '''
+	try:
+		from PIL import Image
+	except ImportError:
+		import cv2
+		im = cv2.imread(file)
+		if im is None:
+			return 0, 0, False
+		return im.shape[0], im.shape[1], True
+	try:
+		with Image.open(file) as im:
+			return im.height, im.width, im.format in readable
+	except (OSError, SyntaxError):
+		return 0, 0, False
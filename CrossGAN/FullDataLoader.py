@@ -1,31 +1,84 @@
 import cv2
 import glob
+import hashlib
 import numpy
+import os
+from DataLoader import normalize
+from DirIndex import DirIndex
 
 class DataLoader:
-	''' load data '''
-	def __init__(self, dir, size = None):
+	''' load data, decoded images are cached on disk as uint8 .npy and memory-mapped '''
+	def __init__(self, dir, size = None, cache_dir = 'cache'):
 		self.dir = dir
 		self.size = size
-		self.files = glob.glob(dir + '/*')
-		self.images = numpy.stack([self.imread(f) for f in self.files])
+		self.index = DirIndex(dir)
+		self.files = self.index.files()
 		self.count = len(self.files)
-		print('loadfrom {}, find {} images'.format(dir+'/*',len(self.files)))
+		self.cache_file = self.cache_path(cache_dir)
+		if not os.path.exists(self.cache_file):
+			self.build_cache()
+		self.images = numpy.load(self.cache_file, mmap_mode = 'r')
+		print('loadfrom {}, find {} images, cache {}'.format(dir+'/*',len(self.files),self.cache_file))
 
-	def load(self,batch_size):
-		''' return a batch of data '''
+	def load(self,batch_size,out = None):
+		''' return a batch of float32 data, written into *out* if given '''
+		return self.load_indexed(batch_size,out)[1]
+
+	def load_indexed(self,batch_size,out = None):
+		''' (image indices, batch) '''
 		ch = numpy.random.choice(self.count, batch_size, replace = True)
-		return self.images[ch]
+		ch.sort() # sequential reads from the memmap
+		return ch, normalize(self.images[ch], out = out)
 
 	def imread(self,file):
-		''' read and preprocess images from file '''
+		''' read and resize image from file, still uint8 '''
 		im = cv2.imread(file)
 		if im is None:
 			raise RuntimeError('{} is not image'.format(file))
 		if self.size:
 			im = cv2.resize(im,dsize = self.size)
-		im = im.astype('float')/255
 		return im
+
+	def cache_prefix(self,cache_dir):
+		''' cache_dir/<dir name>-<dir hash>-<size>-, shared by every cache of this directory and size '''
+		dir = os.path.abspath(self.dir)
+		size = '{}x{}'.format(*self.size) if self.size else 'full'
+		name = '{}-{}-{}-'.format(os.path.basename(dir), hashlib.sha1(dir.encode()).hexdigest()[:8], size)
+		return os.path.join(cache_dir, name)
+
+	def cache_path(self,cache_dir):
+		''' cache file keyed by directory, size and file mtimes '''
+		key = hashlib.sha1(repr((os.path.abspath(self.dir), self.size)).encode())
+		for f in self.files:
+			name = os.path.basename(f)
+			size, mtime = self.index.entries[name][:2]
+			key.update('{}:{}:{}\n'.format(name, size, mtime).encode())
+		return self.cache_prefix(cache_dir) + key.hexdigest()[:16] + '.npy'
+
+	def build_cache(self):
+		''' decode every image once into the cache file (write to temp, then rename) '''
+		if not self.count:
+			raise RuntimeError('no valid images in {}'.format(self.dir))
+		print('building cache {} for {} images'.format(self.cache_file,self.count))
+		os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok = True)
+		tmp = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+		first = self.imread(self.files[0])
+		out = numpy.lib.format.open_memmap(tmp, mode = 'w+', dtype = numpy.uint8, shape = (self.count,) + first.shape)
+		out[0] = first
+		for i,f in enumerate(self.files[1:], 1):
+			out[i] = self.imread(f)
+		out.flush()
+		del out
+		os.replace(tmp, self.cache_file)
+		# older caches of the same directory and size are stale
+		prefix = self.cache_prefix(os.path.dirname(self.cache_file))
+		for old in glob.glob(glob.escape(prefix) + '*.npy'):
+			if old != self.cache_file:
+				print('removing stale cache', old)
+				try:
+					os.remove(old)
+				except FileNotFoundError:
+					pass
 	
 	@staticmethod
 	def save_image(img,file):
@@ -41,4 +94,4 @@ def test():
 		DataLoader.save_image(im,file = 'testimo/{}.png'.format(i))
 
 if __name__ == '__main__':
-	test()
\ No newline at end of file
+	test()
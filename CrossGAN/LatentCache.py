@@ -0,0 +1,30 @@
+import numpy
+
+class LatentCache:
+	''' float16 latent codes of one dataset under one encoder, keyed by image index
+	and encoder version : invalidate() after the encoder trains drops every code at once '''
+	def __init__(self, encoder, count):
+		self.encoder = encoder
+		self.count = count
+		self.z = None
+		self.versions = numpy.full(count, -1, numpy.int64)
+		self.version = 0
+		self.hits = 0
+		self.misses = 0
+
+	def invalidate(self):
+		self.version += 1
+
+	def encode(self, ids, images):
+		''' float32 codes of *images* (dataset rows *ids*), running the encoder only for stale ones '''
+		stale = self.versions[ids] != self.version
+		n = int(stale.sum())
+		if n:
+			z = self.encoder.predict(images[stale], batch_size = n)
+			if self.z is None:
+				self.z = numpy.empty((self.count,) + z.shape[1:], numpy.float16)
+			self.z[ids[stale]] = z
+			self.versions[ids[stale]] = self.version
+		self.misses += n
+		self.hits += len(ids) - n
+		return self.z[ids].astype(numpy.float32)
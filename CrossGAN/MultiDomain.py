@@ -0,0 +1,59 @@
+''' N-style translator : one AutoEncoder per style, an input batch is encoded once
+by its own style's encoder and decoded by every style's decoder in the same predict
+
+python MultiDomain.py photo out/ a.jpg b.jpg   # each image into all styles
+'''
+import numpy
+from AutoEncoder import AutoEncoder
+
+styles = ['cezanne','monet','photo','ukiyoe','vangogh']
+
+class MultiDomain:
+	def __init__(self, names = styles, size = 128):
+		self.names = list(names)
+		self.domains = {name:AutoEncoder(name, size) for name in self.names}
+		self.fanouts = {}
+
+	def tryload(self):
+		for ae in self.domains.values():
+			try:
+				ae.load()
+			except (OSError,ValueError) as e:
+				print(ae.name, " load failed :", e)
+
+	def fanout(self, source):
+		''' Model : image of *source* style -> [image in each style], shared encoding '''
+		if source not in self.fanouts:
+			from keras.models import Model
+			src = self.domains[source]
+			self.fanouts[source] = Model(src.i, [self.domains[name].decoder(src.z) for name in self.names])
+		return self.fanouts[source]
+
+	def translate(self, source, images, batch_size = 32):
+		''' {style : translated images} from one graph execution per batch '''
+		out = self.fanout(source).predict(images, batch_size = batch_size)
+		if len(self.names) == 1:
+			out = [out]
+		return dict(zip(self.names, out))
+
+if __name__ == '__main__':
+	import argparse
+	import cv2
+	import os
+	parser = argparse.ArgumentParser()
+	parser.add_argument("source", choices=styles)
+	parser.add_argument("output", type=str)
+	parser.add_argument("images", nargs='+')
+	parser.add_argument("-s","--size", default=128, type=int)
+	args = parser.parse_args()
+	print(args)
+
+	m = MultiDomain(size = args.size)
+	m.tryload()
+	x = numpy.stack([cv2.resize(cv2.imread(f), dsize = (args.size,args.size)) for f in args.images])
+	x = numpy.multiply(x, numpy.float32(1/255), dtype = numpy.float32)
+	os.makedirs(args.output, exist_ok = True)
+	for style,y in m.translate(args.source, x).items():
+		for f,im in zip(args.images, y):
+			name = os.path.splitext(os.path.basename(f))[0]
+			cv2.imwrite('{}/{}-{}.png'.format(args.output, name, style), numpy.clip(im*255, 0, 255).astype(numpy.uint8))
@@ -0,0 +1,135 @@
+''' data-parallel autoencoder training : each batch is sharded over N local processes
+
+every worker holds a replica of both AutoEncoders, computes the gradients of
+its shard, writes them into a shared-memory slot, then all workers apply the
+same averaged gradients, so replicas stay identical without sending weights
+'''
+import multiprocessing
+import numpy
+import queue
+
+dirs = ['x2photo/train/ukiyoe','x2photo/train/photo']
+names = ['ukiyoe','photo']
+
+def build(size):
+	from AutoEncoder import AutoEncoder
+	return [AutoEncoder(name,size) for name in names]
+
+def params(aes):
+	''' trainable weights of both autoencoders (discriminators are not part of this phase) '''
+	return [w for ae in aes for w in ae.autoencoder.trainable_weights]
+
+def flatten(values):
+	return numpy.concatenate([v.reshape(-1) for v in values])
+
+def unflatten(flat, shapes):
+	out, i = [], 0
+	for s in shapes:
+		n = int(numpy.prod(s))
+		out.append(flat[i:i+n].reshape(s))
+		i += n
+	return out
+
+def _worker(rank, n, weights, grads, barrier, losses, rounds, batch_size, size, auto_loss, threads):
+	import keras
+	import tensorflow
+	from keras import backend as K
+	from FullDataLoader import DataLoader
+
+	# N workers with TF's default of one thread per core would fight over the cores
+	tf = getattr(getattr(tensorflow, 'compat', None), 'v1', tensorflow)
+	config = tf.ConfigProto(intra_op_parallelism_threads=threads, inter_op_parallelism_threads=1)
+	K.set_session(tf.Session(config=config))
+
+	numpy.random.seed(rank) # every worker samples its own shard
+
+	aes = build(size)
+	for ae,dir in zip(aes,dirs):
+		ae.dataset = DataLoader(dir,(size,size))
+	p = params(aes)
+	shapes = [K.int_shape(w) for w in p]
+	K.batch_set_value(zip(p, unflatten(numpy.frombuffer(weights, numpy.float32), shapes)))
+
+	loss = auto_loss * sum(K.mean(K.square(ae.o - ae.i)) for ae in aes)
+	inputs = [ae.i for ae in aes]
+	grad_fn = K.function(inputs, [loss] + K.gradients(loss, p))
+
+	# feed the averaged gradients to the optimizer instead of letting it differentiate
+	placeholders = [K.placeholder(shape = s) for s in shapes]
+	optimizer = keras.optimizers.RMSprop()
+	optimizer.get_gradients = lambda loss, params: placeholders
+	apply_fn = K.function(placeholders, [], updates = optimizer.get_updates(loss, p))
+
+	g = numpy.frombuffer(grads, numpy.float32).reshape(n, -1)
+	shard = batch_size // n
+	for round in range(rounds):
+		out = grad_fn([ae.dataset.load(shard) for ae in aes])
+		g[rank] = flatten(out[1:])
+		barrier.wait()
+		apply_fn(unflatten(g.mean(axis = 0), shapes))
+		barrier.wait() # nobody overwrites its slot before everyone averaged
+		if rank == 0:
+			losses.put((round, float(out[0])))
+
+	if rank == 0:
+		numpy.frombuffer(weights, numpy.float32)[:] = flatten(K.batch_get_value(p))
+
+def train(workers = 4, rounds = 1000, batch_size = 128, size = 128, auto_loss = 5, threads = 0):
+	''' train both autoencoders on *workers* processes, load/save weights like main.CrossEncoder
+	*threads* : TF intra-op threads per worker, 0 splits the cores evenly '''
+	import os
+	from keras import backend as K
+	from FullDataLoader import DataLoader
+	for dir in dirs: # build the image caches once here, not once per worker
+		DataLoader(dir,(size,size))
+	threads = threads or max(1, (os.cpu_count() or 1) // workers)
+
+	aes = build(size)
+	for ae in aes:
+		try:
+			ae.load()
+		except (OSError,ValueError) as e:
+			print(ae.name, " load failed :", e)
+	p = params(aes)
+	init = flatten(K.batch_get_value(p)).astype(numpy.float32)
+
+	ctx = multiprocessing.get_context('spawn') # a forked TF session is not usable
+	weights = ctx.RawArray('f', init.size)
+	numpy.frombuffer(weights, numpy.float32)[:] = init
+	grads = ctx.RawArray('f', init.size * workers)
+	barrier = ctx.Barrier(workers)
+	losses = ctx.Queue()
+
+	args = (workers, weights, grads, barrier, losses, rounds, batch_size, size, auto_loss, threads)
+	procs = [ctx.Process(target = _worker, args = (rank,) + args, daemon = True) for rank in range(workers)]
+	for proc in procs:
+		proc.start()
+	done = 0
+	while done < rounds:
+		try:
+			round, loss = losses.get(timeout = 10)
+		except queue.Empty:
+			if not all(proc.is_alive() for proc in procs):
+				barrier.abort()
+				raise RuntimeError('a training worker died')
+			continue
+		print(round, 'auto', loss, flush = True)
+		done += 1
+	for proc in procs:
+		proc.join()
+
+	K.batch_set_value(zip(p, unflatten(numpy.frombuffer(weights, numpy.float32), [K.int_shape(w) for w in p])))
+	for ae in aes:
+		ae.save()
+
+if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-n","--workers", default=4, type=int)
+	parser.add_argument("-r","--rounds", default=1000, type=int)
+	parser.add_argument("-b","--batch_size", default=128, type=int)
+	parser.add_argument("-s","--size", default=128, type=int)
+	parser.add_argument("-t","--threads", default=0, type=int, help="TF threads per worker, 0 : cores / workers")
+	args = parser.parse_args()
+	print(args)
+	train(args.workers, args.rounds, args.batch_size, args.size, threads = args.threads)
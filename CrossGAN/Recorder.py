@@ -0,0 +1,125 @@
+import json
+import time
+from contextlib import contextmanager
+
+class Recorder:
+	''' per-step wall times and losses, handed to *sinks* once per step
+	with no sinks it only keeps the current record '''
+	def __init__(self, *sinks):
+		self.sinks = sinks
+		self.record = None
+
+	def step(self, round):
+		''' start the record of *round*, finish the previous one '''
+		self.end()
+		self.record = {'round': round, 'start': time.time()}
+
+	@contextmanager
+	def time(self, name):
+		''' add the wall time of the block to *name*_sec, nothing outside a step '''
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			if self.record is not None:
+				key = name + '_sec'
+				self.record[key] = self.record.get(key, 0.0) + time.perf_counter() - start
+
+	def loss(self, name, values, names = None):
+		''' record what train_on_batch returned, *names* usually model.metrics_names
+		nothing outside a step '''
+		if values is None or self.record is None:
+			return
+		if not isinstance(values, (list, tuple)):
+			self.record[name] = float(values)
+			return
+		if names is None:
+			names = range(len(values))
+		for n,v in zip(names, values):
+			self.record['{}_{}'.format(name, n)] = float(v)
+
+	def end(self):
+		''' hand the current record to the sinks '''
+		if self.record is None:
+			return
+		for s in self.sinks:
+			s.write(self.record)
+		self.record = None
+
+	def close(self):
+		self.end()
+		for s in self.sinks:
+			s.close()
+
+class JsonlSink:
+	''' one json object per line, written through a large buffer '''
+	def __init__(self, path, buffering = 1<<16):
+		self.path = path
+		self.buffering = buffering
+		self.file = None
+
+	def write(self, record):
+		if self.file is None:
+			self.file = open(self.path, 'a', buffering = self.buffering)
+		self.file.write(json.dumps(record))
+		self.file.write('\n')
+
+	def close(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
+
+class CsvSink:
+	''' columns are *fieldnames*, or the keys of the first record ; a record with
+	new keys starts the next part file (path-1.csv, path-2.csv ...) with the wider header,
+	so nothing is dropped '''
+	def __init__(self, path, fieldnames = None, buffering = 1<<16):
+		self.path = path
+		self.fieldnames = list(fieldnames) if fieldnames else None
+		self.buffering = buffering
+		self.part = 0
+		self.file = None
+		self.writer = None
+
+	def part_path(self):
+		import os
+		if self.part == 0:
+			return self.path
+		root, ext = os.path.splitext(self.path)
+		return '{}-{}{}'.format(root, self.part, ext)
+
+	def header(self, path):
+		''' header of an existing non-empty file, None if there is none '''
+		try:
+			with open(path, newline = '') as f:
+				line = f.readline()
+		except OSError:
+			return None
+		return line.rstrip('\r\n').split(',') if line else None
+
+	def open(self, fieldnames):
+		import csv
+		if self.file is not None:
+			self.file.close()
+			self.part += 1
+		# never append under a different header
+		while self.header(self.part_path()) not in (None, fieldnames):
+			self.part += 1
+		self.fieldnames = fieldnames
+		self.file = open(self.part_path(), 'a', newline = '', buffering = self.buffering)
+		self.writer = csv.DictWriter(self.file, fieldnames = fieldnames)
+		if self.file.tell() == 0:
+			self.writer.writeheader()
+
+	def write(self, record):
+		if self.file is None:
+			self.open(self.fieldnames or list(record))
+		new = [k for k in record if k not in self.fieldnames]
+		if new:
+			self.open(self.fieldnames + new)
+		self.writer.writerow(record)
+
+	def close(self):
+		if self.file is not None:
+			self.file.close()
+			self.file = None
@@ -0,0 +1,72 @@
+import os
+import queue
+import threading
+
+class Writer:
+	''' run slow saves (png encoding, hdf5 writes, plots) on a background thread
+	the trainer hands off copies, so it can keep training while they are written '''
+	def __init__(self, depth = 8):
+		self.queue = queue.Queue(depth)
+		self.error = None
+		self.thread = threading.Thread(target = self._run, daemon = True)
+		self.thread.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def submit(self, fn, *args):
+		''' call fn(*args) on the writer thread, blocks only when *depth* jobs are pending '''
+		self._raise()
+		self.queue.put((fn, args))
+
+	def close(self):
+		''' finish pending jobs '''
+		if self.thread.is_alive():
+			self.queue.put(None)
+			self.thread.join()
+		self._raise()
+
+	def _raise(self):
+		if self.error is not None:
+			e, self.error = self.error, None
+			raise RuntimeError('background write failed') from e
+
+	def _run(self):
+		while True:
+			job = self.queue.get()
+			if job is None:
+				return
+			fn, args = job
+			try:
+				fn(*args)
+			except Exception as e:
+				self.error = e
+
+def snapshot_weights(model):
+	''' copy weights of *model* as [(layer name, [weight names], [values])] '''
+	from keras import backend as K
+	return [(l.name, [w.name for w in l.weights], K.batch_get_value(l.weights)) for l in model.layers]
+
+def write_weights(path, snapshot):
+	''' write a snapshot_weights copy in the keras save_weights layout (temp file, then rename) '''
+	import h5py
+	import keras
+	from keras import backend as K
+	tmp = '{}.{}.tmp'.format(path, os.getpid())
+	with h5py.File(tmp, 'w') as f:
+		f.attrs['layer_names'] = [name.encode('utf8') for name,_,_ in snapshot]
+		f.attrs['backend'] = K.backend().encode('utf8')
+		f.attrs['keras_version'] = str(keras.__version__).encode('utf8')
+		for name, names, values in snapshot:
+			g = f.create_group(name)
+			g.attrs['weight_names'] = [n.encode('utf8') for n in names]
+			for n,v in zip(names, values):
+				d = g.create_dataset(n, v.shape, dtype = v.dtype)
+				if not v.shape:
+					d[()] = v
+				else:
+					d[:] = v
+	os.replace(tmp, path)
@@ -0,0 +1,30 @@
+''' bytes and time per batch : old float64 path vs uint8 -> float32 into a preallocated buffer '''
+import numpy
+import timeit
+from DataLoader import normalize
+
+def old(batch):
+	x = batch.astype('float')/255
+	return x.astype('float32') # keras downcasts every batch
+
+def new(batch,out):
+	return normalize(batch, out = out)
+
+def main(batch_size = 64, size = 128, number = 50):
+	batch = numpy.random.randint(0, 256, (batch_size,size,size,3), numpy.uint8)
+	out = numpy.empty(batch.shape, numpy.float32)
+
+	t_old = timeit.timeit(lambda: old(batch), number = number) / number
+	t_new = timeit.timeit(lambda: new(batch,out), number = number) / number
+
+	# old : float64 result + float64 division temp + float32 copy, new : the float32 buffer only
+	b_old = batch.size * (8 + 8 + 4)
+	b_new = batch.size * 4
+
+	print('batch {}x{}x{}x3'.format(batch_size,size,size))
+	print('old float64 : {:8.2f} ms {:8.1f} MB'.format(t_old*1e3, b_old/2**20))
+	print('new float32 : {:8.2f} ms {:8.1f} MB'.format(t_new*1e3, b_new/2**20))
+	print('saved       : {:8.2f} ms {:8.1f} MB'.format((t_old-t_new)*1e3, (b_old-b_new)/2**20))
+
+if __name__ == '__main__':
+	main()
@@ -8,17 +8,17 @@ from keras.layers.convolutional import UpSampling2D, Conv2D
 from keras.models import Sequential, Model
 from keras.optimizers import Adam
 import datetime
-import matplotlib.pyplot as plt
 import sys
 from data_loader import DataLoader
+from Writer import Writer
 import numpy as np
 import os
 
 class CycleGAN():
-    def __init__(self):
+    def __init__(self, img_size=128):
         # Input shape
-        self.img_rows = 128
-        self.img_cols = 128
+        self.img_rows = img_size
+        self.img_cols = img_size
         self.channels = 3
         self.img_shape = (self.img_rows, self.img_cols, self.channels)
 
@@ -144,7 +144,17 @@ class CycleGAN():
 
         return Model(img, validity)
 
-    def train(self, epochs, batch_size=128, save_interval=50):
+    def train(self, epochs, batch_size=128, save_interval=50, replay_size=0):
+        """replay_size > 0 : discriminators learn from a history of fakes, see _train_replay"""
+
+        # sample plots are drawn and saved in the background
+        with Writer() as self.writer:
+            if replay_size:
+                self._train_replay(epochs, batch_size, save_interval, replay_size)
+            else:
+                self._train(epochs, batch_size, save_interval)
+
+    def _train(self, epochs, batch_size, save_interval):
 
         half_batch = int(batch_size / 2)
 
@@ -156,8 +166,7 @@ class CycleGAN():
             #  Train Discriminators
             # ----------------------
 
-            imgs_A = self.data_loader.load_data(domain="A", batch_size=half_batch)
-            imgs_B = self.data_loader.load_data(domain="B", batch_size=half_batch)
+            imgs_A, imgs_B = self.data_loader.load_pair(batch_size=half_batch)
 
             # Translate images to opposite domain
             fake_B = self.g_AB.predict(imgs_A)
@@ -184,8 +193,7 @@ class CycleGAN():
             # ------------------
 
             # Sample a batch of images from both domains
-            imgs_A = self.data_loader.load_data(domain="A", batch_size=batch_size)
-            imgs_B = self.data_loader.load_data(domain="B", batch_size=batch_size)
+            imgs_A, imgs_B = self.data_loader.load_pair(batch_size=batch_size)
 
             # The generators want the discriminators to label the translated images as real
             valid = np.ones((batch_size,) + self.disc_patch)
@@ -201,12 +209,73 @@ class CycleGAN():
             if epoch % save_interval == 0:
                 self.save_imgs(epoch)
 
+    def _train_replay(self, epochs, batch_size, save_interval, replay_size):
+        """Generators first, their translations go to replay buffers, the discriminators
+        sample fakes from the buffers, so there is no extra g_AB / g_BA predict per epoch"""
+
+        half_batch = int(batch_size / 2)
+
+        pool_A = ReplayBuffer(replay_size, self.img_shape)
+        pool_B = ReplayBuffer(replay_size, self.img_shape)
+        generator_step = self._make_generator_step()
+
+        valid = np.ones((batch_size,) + self.disc_patch)
+        fake = np.zeros((half_batch,) + self.disc_patch)
+
+        start_time = datetime.datetime.now()
+
+        for epoch in range(epochs):
+
+            imgs_A, imgs_B = self.data_loader.load_pair(batch_size=batch_size)
+
+            # Train the generators, keep what they translated
+            g_loss, fake_B, fake_A = generator_step([imgs_A, imgs_B], [valid, valid, imgs_A, imgs_B, imgs_A, imgs_B])
+            pool_A.add(fake_A)
+            pool_B.add(fake_B)
+
+            # Train the discriminators on real images and on fakes from history
+            dA_loss_real = self.d_A.train_on_batch(imgs_A[:half_batch], valid[:half_batch])
+            dA_loss_fake = self.d_A.train_on_batch(pool_A.sample(half_batch), fake)
+            dA_loss = 0.5 * np.add(dA_loss_real, dA_loss_fake)
+
+            dB_loss_real = self.d_B.train_on_batch(imgs_B[:half_batch], valid[:half_batch])
+            dB_loss_fake = self.d_B.train_on_batch(pool_B.sample(half_batch), fake)
+            dB_loss = 0.5 * np.add(dB_loss_real, dB_loss_fake)
+
+            d_loss = 0.5 * np.add(dA_loss, dB_loss)
+
+            elapsed_time = datetime.datetime.now() - start_time
+            print ("%d time: %s" % (epoch, elapsed_time))
+
+            if epoch % save_interval == 0:
+                self.save_imgs(epoch)
+
+    def _make_generator_step(self):
+        """combined.train_on_batch that also returns the fake_B, fake_A it computed"""
+        from keras import backend as K
+        m = self.combined
+        inputs = m._feed_inputs + m._feed_targets + m._feed_sample_weights
+        if m._uses_dynamic_learning_phase():
+            inputs += [K.learning_phase()]
+        updates = m.updates + m.optimizer.get_updates(params=m._collected_trainable_weights, loss=m.total_loss)
+        fake_B, fake_A = m.outputs[2], m.outputs[3]
+        fn = K.function(inputs, [m.total_loss] + m.metrics_tensors + [fake_B, fake_A],
+                        updates=updates, name='generator_step')
+
+        def step(x, y):
+            x, y, w = m._standardize_user_data(x, y)
+            ins = x + y + w
+            if m._uses_dynamic_learning_phase():
+                ins += [1]
+            out = fn(ins)
+            return out[:-2], out[-2], out[-1]
+        return step
+
     def save_imgs(self, epoch):
         os.makedirs('images/%s' % self.dataset_name, exist_ok=True)
         r, c = 2, 3
 
-        imgs_A = self.data_loader.load_data(domain="A", batch_size=1, is_testing=True)
-        imgs_B = self.data_loader.load_data(domain="B", batch_size=1, is_testing=True)
+        imgs_A, imgs_B = self.data_loader.load_pair(batch_size=1, is_testing=True)
 
         # Demo (for GIF)
         #imgs_A = self.data_loader.load_img('datasets/apple2orange/testA/n07740461_1541.jpg')
@@ -224,19 +293,45 @@ class CycleGAN():
         # Rescale images 0 - 1
         gen_imgs = 0.5 * gen_imgs + 0.5
 
-        titles = ['Original', 'Translated', 'Reconstructed']
-        fig, axs = plt.subplots(r, c)
-        cnt = 0
-        for i in range(r):
-            for j in range(c):
-                axs[i,j].imshow(gen_imgs[cnt])
-                axs[i, j].set_title(titles[j])
-                axs[i,j].axis('off')
-                cnt += 1
-        fig.savefig("images/%s/%d.png" % (self.dataset_name, epoch))
-        plt.close()
+        self.writer.submit(plot_imgs, gen_imgs, r, c, "images/%s/%d.png" % (self.dataset_name, epoch))
+
+
+class ReplayBuffer():
+    """Preallocated ring buffer of the last *capacity* generated images"""
+    def __init__(self, capacity, img_shape):
+        self.images = np.empty((capacity,) + img_shape, np.float32)
+        self.count = 0
+        self.pos = 0
+
+    def add(self, imgs):
+        for img in imgs[-len(self.images):]:
+            self.images[self.pos] = img
+            self.pos = (self.pos + 1) % len(self.images)
+        self.count = min(self.count + len(imgs), len(self.images))
+
+    def sample(self, n):
+        return self.images[np.random.randint(self.count, size=n)]
+
+
+def plot_imgs(gen_imgs, r, c, path):
+    """Draw the sample grid and save it, no pyplot state so it is safe off the main thread"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    titles = ['Original', 'Translated', 'Reconstructed']
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(r, c)
+    cnt = 0
+    for i in range(r):
+        for j in range(c):
+            axs[i,j].imshow(gen_imgs[cnt])
+            axs[i, j].set_title(titles[j])
+            axs[i,j].axis('off')
+            cnt += 1
+    fig.savefig(path)
 
 
 if __name__ == '__main__':
     gan = CycleGAN()
-    gan.train(epochs=30000, batch_size=2, save_interval=200)
+    gan.train(epochs=30000, batch_size=2, save_interval=200, replay_size=50)
@@ -0,0 +1,62 @@
+import cv2
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from DirIndex import DirIndex
+
+class DataLoader:
+	''' loader for cyclegan.py : datasets/{dataset_name}/{train,test}{A,B}/*
+	images are RGB, scaled to [-1,1] for the tanh generator, decoded by a thread pool
+	and kept resized as uint8 in separate train / test caches '''
+	def __init__(self, dataset_name, img_res = (128,128), workers = 4, cache = True):
+		self.dataset_name = dataset_name
+		self.img_res = img_res
+		self.pool = ThreadPoolExecutor(workers)
+		self.cache = {False:{}, True:{}} if cache else None
+		self.files = {}
+
+	def folder(self, domain, is_testing):
+		return 'datasets/{}/{}{}'.format(self.dataset_name, 'test' if is_testing else 'train', domain)
+
+	def list(self, domain, is_testing):
+		key = (domain, is_testing)
+		if key not in self.files:
+			self.files[key] = DirIndex(self.folder(domain, is_testing)).files()
+		return self.files[key]
+
+	def imread(self, file, is_testing):
+		''' resized RGB uint8 image, from the cache if possible '''
+		cache = None if self.cache is None else self.cache[is_testing]
+		if cache is not None and file in cache:
+			return cache[file]
+		im = cv2.imread(file)
+		if im is None:
+			raise RuntimeError('{} is not image'.format(file))
+		im = cv2.resize(im, dsize = (self.img_res[1], self.img_res[0]))
+		im = cv2.cvtColor(im, cv2.COLOR_BGR2RGB)
+		if cache is not None:
+			cache[file] = im
+		return im
+
+	def batches(self, domains, batch_size, is_testing):
+		''' one batch per domain, all files decoded concurrently '''
+		files = [numpy.random.choice(self.list(d, is_testing), batch_size) for d in domains]
+		ims = list(self.pool.map(lambda f: self.imread(f, is_testing), numpy.concatenate(files)))
+		out = numpy.empty((len(domains), batch_size) + tuple(self.img_res) + (3,), numpy.float32)
+		for o,im in zip(out.reshape((-1,) + out.shape[2:]), ims):
+			if not is_testing and numpy.random.random() > 0.5:
+				im = im[:, ::-1]
+			numpy.multiply(im, numpy.float32(1/127.5), out = o)
+		out -= 1
+		return out
+
+	def load_data(self, domain, batch_size = 1, is_testing = False):
+		''' a batch of *domain* ('A' or 'B') '''
+		return self.batches([domain], batch_size, is_testing)[0]
+
+	def load_pair(self, batch_size = 1, is_testing = False):
+		''' (batch of A, batch of B) in one call '''
+		imgs_A, imgs_B = self.batches(['A','B'], batch_size, is_testing)
+		return imgs_A, imgs_B
+
+	def close(self):
+		self.pool.shutdown()
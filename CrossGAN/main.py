@@ -1,20 +1,36 @@
 import keras
 from FullDataLoader import DataLoader
+from DataLoader import Prefetcher
 from AutoEncoder import AutoEncoder
+from Recorder import Recorder, JsonlSink
+from Writer import Writer, snapshot_weights
+from Checkpoint import Checkpointer, optimizer_state, set_optimizer_state
+from LatentCache import LatentCache
 
 class CrossEncoder():
-	def __init__(self):
+	def __init__(self, latent_cache=False, size=128, prefetch=0):
+		''' *latent_cache* : keep float16 codes of dataset images, decoder-only work skips the encoders
+		*size* : image width and height
+		*prefetch* : background workers per domain decoding the next training batches, 0 for none
+		the workers draw from the global numpy random state concurrently and queued batches are
+		dropped, so with prefetch a resumed run does not replay the same data stream '''
 		from keras.models import Model
 		from keras.layers import Input
 		import numpy
 
 		self.auto_loss = 5
 		self.cross_loss = 1
+		self.recorder = Recorder()
+		self.writer = Writer()
 
-		self.a = a = AutoEncoder('ukiyoe')
+		self.a = a = AutoEncoder('ukiyoe',size)
 		self.a.dataset = DataLoader('x2photo/train/ukiyoe',(a.width,a.height))
-		self.b = b = AutoEncoder('photo')
+		self.b = b = AutoEncoder('photo',size)
 		self.b.dataset = DataLoader('x2photo/train/photo',(b.width,b.height))
+		for ae in (a,b):
+			if prefetch:
+				ae.dataset = Prefetcher(ae.dataset,workers=prefetch)
+			ae.latents = LatentCache(ae.encoder,ae.dataset.count) if latent_cache else None
 		
 		a.discriminator.compile(optimizer = 'rmsprop',loss = 'mse', metrics=['accuracy'])
 		b.discriminator.compile(optimizer = 'rmsprop',loss = 'mse', metrics=['accuracy'])
@@ -43,66 +59,178 @@ class CrossEncoder():
 		models.gba = Model(b.i, fack_a)
 		models.cross_ab = cross_ab
 		models.cross_ba = cross_ba
+		models.sample = Model([a.i,b.i],[a.o,fack_b,b.o,fack_a])
+		if latent_cache:
+			za,zb = Input(a.z_shape),Input(b.z_shape)
+			models.sample_z = Model([za,zb],[a.decoder(za),b.decoder(za),b.decoder(zb),a.decoder(zb)])
+
+		# fused graphs : both domains in one call per phase, see train_fused
+		models.fused_g = Model([a.i,b.i],[a.o,b.o,db,da])
+		models.fused_g.compile(optimizer = 'rmsprop',loss = 'mse',
+			loss_weights=[self.auto_loss,self.auto_loss,self.cross_loss,self.cross_loss])
+
+		coders = [a.encoder,a.decoder,b.encoder,b.decoder]
+		for m in coders: m.trainable = False
+		a.discriminator.trainable = True
+		b.discriminator.trainable = True
+		models.fused_d = Model([a.i,b.i],[a.discriminator(a.i),da,b.discriminator(b.i),db])
+		models.fused_d.compile(optimizer = 'rmsprop',loss = 'mse')
+		for m in coders: m.trainable = True
+		a.discriminator.trainable = False
+		b.discriminator.trainable = False
+
+		# whose encoder each trained model updates, their cached codes go stale
+		self.trains_encoder = {'auto_a':(a,),'auto_b':(b,),'cross_ab':(a,),'cross_ba':(b,),'fused_g':(a,b)}
 
 	def generate_a(self,batch_size):
 		''' generate *batch_size* a from b '''
-		data = self.b.dataset.load(batch_size)
-		return self.models.gab.predict(data,batch_size=batch_size)
+		if self.b.latents:
+			return self.a.decoder.predict(self.encode(self.b,batch_size),batch_size=batch_size)
+		data = self.load(self.b,batch_size)
+		return self.models.gba.predict(data,batch_size=batch_size)
 
 	def generate_b(self,batch_size):
-		''' generate *batch_size* a from b '''
-		data = self.a.dataset.load(batch_size)
-		return self.models.gba.predict(data,batch_size=batch_size)
+		''' generate *batch_size* b from a '''
+		if self.a.latents:
+			return self.b.decoder.predict(self.encode(self.a,batch_size),batch_size=batch_size)
+		data = self.load(self.a,batch_size)
+		return self.models.gab.predict(data,batch_size=batch_size)
+
+	def load(self,ae,batch_size,indexed=False):
+		''' load a batch from *ae*.dataset, timed as load, with image indices if *indexed* '''
+		with self.recorder.time('load'):
+			if indexed:
+				return ae.dataset.load_indexed(batch_size)
+			return ae.dataset.load(batch_size)
+
+	def encode(self,ae,batch_size,images=False):
+		''' codes of a fresh batch from *ae*.dataset through its latent cache, (images, codes) if *images* '''
+		ids,data = self.load(ae,batch_size,indexed=True)
+		z = ae.latents.encode(ids,data)
+		return (data,z) if images else z
+
+	def invalidate_latents(self,aes=None):
+		''' call after anything that changes the encoders of *aes* (default both) '''
+		for ae in aes or (self.a,self.b):
+			if ae.latents:
+				ae.latents.invalidate()
+
+	def train_on_batch(self,name,model,x,y):
+		''' model.train_on_batch, loss recorded as *name*, latents invalidated if it trains an encoder '''
+		loss = model.train_on_batch(x,y)
+		self.recorder.loss(name,loss,model.metrics_names)
+		if name in self.trains_encoder:
+			self.invalidate_latents(self.trains_encoder[name])
+		return loss
 
 	def train_discrimator(self):
-		''' train discirminator TODO: log loss '''
+		''' train discirminator '''
 		
 		half_batch = self.batch_size//2
 
-		real_a = self.a.dataset.load(half_batch)
+		real_a = self.load(self.a,half_batch)
 		fack_a = self.generate_a(half_batch)
 
-		real_b = self.b.dataset.load(half_batch)
+		real_b = self.load(self.b,half_batch)
 		fack_b = self.generate_b(half_batch)
 
-		self.a.discriminator.train_on_batch(real_a, self.real_flags[:half_batch])
-		self.a.discriminator.train_on_batch(fack_a, self.fake_flags[:half_batch])
+		self.train_on_batch('dis_a_real',self.a.discriminator,real_a, self.real_flags[:half_batch])
+		self.train_on_batch('dis_a_fake',self.a.discriminator,fack_a, self.fake_flags[:half_batch])
 
-		self.b.discriminator.train_on_batch(real_b, self.real_flags[:half_batch])
-		self.b.discriminator.train_on_batch(fack_b, self.fake_flags[:half_batch])
+		self.train_on_batch('dis_b_real',self.b.discriminator,real_b, self.real_flags[:half_batch])
+		self.train_on_batch('dis_b_fake',self.b.discriminator,fack_b, self.fake_flags[:half_batch])
 
 	def train_autoencoder(self):
 		''' TODO? : combine two model on training? '''
-		real_a = self.a.dataset.load(self.batch_size)
-		real_b = self.b.dataset.load(self.batch_size)
+		real_a = self.load(self.a,self.batch_size)
+		real_b = self.load(self.b,self.batch_size)
 
-		self.a.autoencoder.train_on_batch(real_a,real_a)
-		self.b.autoencoder.train_on_batch(real_b,real_b)
+		self.train_on_batch('auto_a',self.a.autoencoder,real_a,real_a)
+		self.train_on_batch('auto_b',self.b.autoencoder,real_b,real_b)
 
 	def train_crossencoder(self):
 		''' TODO? : combine two model on training? '''
-		data = self.a.dataset.load(self.batch_size)
-		self.models.cross_ab.train_on_batch(data,self.real_flags)
-		data = self.b.dataset.load(self.batch_size)
-		self.models.cross_ba.train_on_batch(data,self.real_flags)
+		data = self.load(self.a,self.batch_size)
+		self.train_on_batch('cross_ab',self.models.cross_ab,data,self.real_flags)
+		data = self.load(self.b,self.batch_size)
+		self.train_on_batch('cross_ba',self.models.cross_ba,data,self.real_flags)
+
+	def train_fused(self):
+		''' one load per domain, reused by both phases : 2 backend calls instead of 8
+		return (generator losses, discriminator losses) '''
+		real_a = self.load(self.a,self.batch_size)
+		real_b = self.load(self.b,self.batch_size)
+		real, fake = self.real_flags, self.fake_flags
+		g = self.train_on_batch('fused_g',self.models.fused_g,[real_a,real_b],[real_a,real_b,real,real])
+		d = self.train_on_batch('fused_d',self.models.fused_d,[real_a,real_b],[real,fake,real,fake])
+		return g,d
 
 	def save(self):
-		self.a.save()
-		self.b.save()
+		''' write weights in the background, see close '''
+		self.a.save(self.writer)
+		self.b.save(self.writer)
+
+	def close(self):
+		''' wait for background writes, stop prefetch workers '''
+		self.writer.close()
+		for ae in (self.a,self.b):
+			if isinstance(ae.dataset,Prefetcher):
+				ae.dataset.close()
 
 	def tryload(self):
-		try:
-			self.a.load()
-		except:
-			print(self.a.name, " load failed")
-			pass
-		try:
-			self.b.load()
-		except:
-			print(self.b.name, " load failed")
-			pass
+		for ae in (self.a,self.b):
+			try:
+				ae.load()
+			except (OSError,ValueError) as e:
+				print(ae.name, " load failed :", e)
+		self.invalidate_latents()
+
+	def compiled(self):
+		''' every compiled model by name, their optimizers are checkpointed '''
+		m = self.models
+		return {
+			'dis_a':self.a.discriminator, 'dis_b':self.b.discriminator,
+			'auto_a':self.a.autoencoder, 'auto_b':self.b.autoencoder,
+			'cross_ab':m.cross_ab, 'cross_ba':m.cross_ba,
+			'fused_g':m.fused_g, 'fused_d':m.fused_d,
+		}
+
+	def state(self,round):
+		''' copy of everything needed to continue at *round* '''
+		import numpy
+		return {
+			'round':round,
+			'weights':{ae.name:snapshot_weights(ae.fullmodel) for ae in (self.a,self.b)},
+			'optimizers':{name:optimizer_state(m) for name,m in self.compiled().items()},
+			'numpy_random':numpy.random.get_state(),
+		}
+
+	def set_state(self,state):
+		import numpy
+		for ae in (self.a,self.b):
+			for name,_,values in state['weights'][ae.name]:
+				ae.fullmodel.get_layer(name).set_weights(values)
+		self.invalidate_latents()
+		for name,m in self.compiled().items():
+			set_optimizer_state(m,state['optimizers'][name])
+		numpy.random.set_state(state['numpy_random'])
 
-	def train(self, epoch=30000, batch_size=128, save_interval=20, save_path='save'):
+	def resume(self,checkpoint):
+		''' restore the newest checkpoint, return the round to continue from
+		without one, fall back to tryload and start at 0
+		the data stream is only reproduced exactly without prefetch '''
+		state = checkpoint.latest()
+		if state is None:
+			self.tryload()
+			return 0
+		print('resume from round', state['round'])
+		self.set_state(state)
+		return state['round']
+
+	def train(self, epoch=30000, batch_size=128, save_interval=20, save_path='save', fused=False, recorder=None,
+		start=0, checkpoint=None, checkpoint_interval=200):
+		''' *recorder* gets per-step load / phase / save times (phase times include their loads) and losses
+		*checkpoint* (a Checkpointer) gets the full state every *checkpoint_interval* rounds, see resume '''
 
 		try:
 			import os
@@ -118,44 +246,99 @@ class CrossEncoder():
 
 		from datetime import timedelta
 		from time import time as now
-		start = now()
-		
-		for round in range(epoch):
-			print(round,end=' ', flush = True)
-			print('auto',end=' ', flush = True)
-			self.train_autoencoder()
-			#print('dis',end=' ', flush = True)
-			#self.train_discrimator()
-			#print('cross',end=' ', flush = True)
-			#self.train_crossencoder()
-			print('end -- ' , str(timedelta(seconds=now()-start)), flush = True)
-
-			if round % save_interval == 0:
-				self.save_images(save_path,round)
+		t0 = now()
+
+		rec = self.recorder = recorder or Recorder()
+		try:
+			for round in range(start,epoch):
+				rec.step(round)
+				print(round,end=' ', flush = True)
+				if fused:
+					print('fused',end=' ', flush = True)
+					with rec.time('fused'): self.train_fused()
+				else:
+					print('auto',end=' ', flush = True)
+					with rec.time('auto'): self.train_autoencoder()
+				#print('dis',end=' ', flush = True)
+				#with rec.time('dis'): self.train_discrimator()
+				#print('cross',end=' ', flush = True)
+				#with rec.time('cross'): self.train_crossencoder()
+				print('end -- ' , str(timedelta(seconds=now()-t0)), flush = True)
+
+				if round % save_interval == 0:
+					with rec.time('save'): self.save_images(save_path,round)
+
+				if checkpoint and (round+1) % checkpoint_interval == 0:
+					with rec.time('checkpoint'): checkpoint.save(round+1,self.state(round+1),self.writer)
+		finally:
+			rec.close()
 
 	def save_images(self,path,round):
-		a,ra,cb = self._gen_save_images(self.a,self.b)
-		b,rb,ca = self._gen_save_images(self.b,self.a)
+		''' one predict for all samples (decoders only with latent caches), pngs are written by self.writer '''
+		if self.a.latents and self.b.latents:
+			a,za = self.encode(self.a,1,images=True)
+			b,zb = self.encode(self.b,1,images=True)
+			ra,cb,rb,ca = self.models.sample_z.predict([za,zb])
+		else:
+			a = self.a.dataset.load(1)
+			b = self.b.dataset.load(1)
+			ra,cb,rb,ca = self.models.sample.predict([a,b])
 
 		l = [a,ra,cb,b,rb,ca]
-		for i,im in enumerate(l):
-			f = '{}/{}-{}.png'.format(path,round,i)
+		files = ['{}/{}-{}.png'.format(path,round,i) for i in range(len(l))]
+		self.writer.submit(self._write_images,l,files)
+
+	@staticmethod
+	def _write_images(images,files):
+		for im,f in zip(images,files):
 			DataLoader.save_image(im,f)
-			
 
-	@staticmethod		
-	def _gen_save_images(a,b):
-		im_a = a.dataset.load(1)
-		z_a = a.encoder.predict(im_a)
-		auto_a = a.decoder.predict(z_a)
-		cross_b = b.decoder.predict(z_a)
-		return im_a,auto_a,cross_b
+
+def train_progressive(stages=((32,2000),(64,2000),(128,6000)), save_path='save', checkpoint=None, **kwargs):
+	''' train at growing sizes, [(size, rounds)], each stage starts from the previous weights
+	coarse structure is learned at small (cheap) sizes, kwargs go to CrossEncoder.train
+
+	rounds count on across stages, every stage has its own save_path/<size>px and,
+	with *checkpoint* (a Checkpointer), its own checkpoint dir, so a stage only ever
+	resumes from a state of its own size ; finished stages are skipped on restart '''
+	import os
+	prev = None
+	offset = 0
+	for size,rounds in stages:
+		end = offset + rounds
+		print('-- stage {}x{} : rounds {} to {} --'.format(size,size,offset,end))
+		E = CrossEncoder(size=size)
+		C = Checkpointer(os.path.join(checkpoint.dir,'{}px'.format(size)), checkpoint.keep) if checkpoint else None
+		state = C.latest() if C else None
+		if state is not None:
+			print('resume from round', state['round'])
+			E.set_state(state)
+			start = state['round']
+		else:
+			if prev is None:
+				E.tryload()
+			else:
+				E.a.copy_weights(prev.a)
+				E.b.copy_weights(prev.b)
+			start = offset
+		if prev is not None:
+			prev.close()
+		if start < end:
+			E.train(end, save_path=os.path.join(save_path,'{}px'.format(size)), start=start, checkpoint=C, **kwargs)
+			# a finished stage is not trained again ; through the writer, after train's own saves
+			if C and end % kwargs.get('checkpoint_interval',200):
+				C.save(end,E.state(end),E.writer)
+		prev = E
+		offset = end
+	return prev
 
 
 if __name__ == '__main__':
-	E = CrossEncoder()
-	E.tryload()
+	E = CrossEncoder(prefetch=2) # faster, but resume is not batch-exact, use prefetch=0 for that
+	C = Checkpointer('save/checkpoints')
+	start = E.resume(C)
 	try:
-		E.train(10000)
+		E.train(10000, recorder=Recorder(JsonlSink('save/log.jsonl')), start=start, checkpoint=C)
 	finally:
-		E.save()
\ No newline at end of file
+		E.save()
+		E.close()
\ No newline at end of file
@@ -0,0 +1,80 @@
+''' translate a directory of any size with trained ukiyoe.h5 / photo.h5
+
+python translate.py photos/ out/ -d ba
+
+decoding, predict and png writing overlap : a reader pool decodes the next
+batches while the current one is predicted, a writer pool encodes the results.
+at most *ahead* batches are in flight, files whose output already exists are
+skipped, so an interrupted run continues where it stopped
+'''
+import collections
+import cv2
+import numpy
+import os
+from concurrent.futures import ThreadPoolExecutor
+from DirIndex import DirIndex
+
+def load_translator(direction, size = 128):
+	''' Model from one domain to the other, 'ab' : ukiyoe -> photo, 'ba' : photo -> ukiyoe '''
+	from keras.models import Model
+	from AutoEncoder import AutoEncoder
+	a = AutoEncoder('ukiyoe', size)
+	b = AutoEncoder('photo', size)
+	a.load()
+	b.load()
+	src, dst = (a,b) if direction == 'ab' else (b,a)
+	return Model(src.i, dst.decoder(src.z))
+
+def output_path(dst, file):
+	''' a.jpg -> dst/a.jpg.png, the source extension is kept so a.jpg and a.png do not collide '''
+	return os.path.join(dst, os.path.basename(file) + '.png')
+
+def read(file, size):
+	''' same preprocessing as the training loaders '''
+	im = cv2.imread(file)
+	if im is None:
+		raise RuntimeError('{} is not image'.format(file))
+	im = cv2.resize(im, dsize = (size,size))
+	return numpy.multiply(im, numpy.float32(1/255), dtype = numpy.float32)
+
+def write(images, outputs):
+	for im,out in zip(images, outputs):
+		tmp = out + '.tmp.png'
+		cv2.imwrite(tmp, numpy.clip(im*255, 0, 255).astype(numpy.uint8))
+		os.replace(tmp, out)
+
+def translate(src, dst, direction = 'ab', batch_size = 64, workers = 4, ahead = 2, size = 128):
+	model = load_translator(direction, size)
+	os.makedirs(dst, exist_ok = True)
+	files = [f for f in DirIndex(src).files() if not os.path.exists(output_path(dst, f))]
+	print('translate {} -> {} : {} files to do'.format(src, dst, len(files)))
+
+	chunks = [files[i:i+batch_size] for i in range(0, len(files), batch_size)]
+	with ThreadPoolExecutor(workers) as readers, ThreadPoolExecutor(workers) as writers:
+		reading = collections.deque()
+		writing = collections.deque()
+		for n,chunk in enumerate(chunks):
+			while len(reading) <= ahead and n + len(reading) < len(chunks):
+				reading.append([readers.submit(read, f, size) for f in chunks[n + len(reading)]])
+			x = numpy.stack([r.result() for r in reading.popleft()])
+			y = model.predict(x, batch_size = batch_size)
+			writing.append(writers.submit(write, y, [output_path(dst, f) for f in chunk]))
+			while len(writing) > ahead:
+				writing.popleft().result()
+			print('{}/{}'.format(min((n+1)*batch_size, len(files)), len(files)), end = '\r', flush = True)
+		for w in writing:
+			w.result()
+	print()
+
+if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("src", type=str)
+	parser.add_argument("dst", type=str)
+	parser.add_argument("-d","--direction", default="ab", choices=["ab","ba"])
+	parser.add_argument("-b","--batch_size", default=64, type=int)
+	parser.add_argument("-w","--workers", default=4, type=int)
+	parser.add_argument("-s","--size", default=128, type=int)
+	args = parser.parse_args()
+	print(args)
+	translate(args.src, args.dst, args.direction, args.batch_size, args.workers, size = args.size)
@@ -1,6 +1,6 @@
 import cv2
 import numpy as np
-import glob
+from DirIndex import DirIndex
 
 test_folder = 'x2photo/test'
 train_folder = 'x2photo/train'
@@ -20,18 +20,59 @@ def images(fileName_iterator):
 			yield im
 
 def normalize(im):
-	return im.astype(np.float)/255
+	return np.multiply(im, np.float32(1/255), dtype = np.float32)
 
-def load_collection(root):
-	D={}
-	for name in label_name:
-		print('reading {}'.format(name))
-		files = glob.glob('{}/{}/*'.format(root,name))
-		imgs = images(files)
-		D[name] = list(normalize(im) for im in imgs)
-	return D
+class Collection:
+	''' lazy view of one style folder, nothing is read before first use
+	c[i] / iter(c) decode and normalise on demand, c.materialize() gives one uint8 array '''
+	def __init__(self, folder, size = None):
+		self.folder = folder
+		self.size = size
+		self._files = None
 
-train = load_collection(train_folder)
-test = load_collection(test_folder)
+	@property
+	def files(self):
+		if self._files is None:
+			self._files = DirIndex(self.folder).files()
+		return self._files
+
+	def __len__(self):
+		return len(self.files)
+
+	def read(self, index):
+		''' decoded (and resized) uint8 image '''
+		file = self.files[index]
+		im = cv2.imread(file)
+		if im is None:
+			raise RuntimeError('{} is not image'.format(file))
+		if self.size:
+			im = cv2.resize(im, dsize = self.size)
+		return im
 
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return [self[i] for i in range(*index.indices(len(self)))]
+		return normalize(self.read(index))
 
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+	def materialize(self):
+		''' all images in one contiguous uint8 array, they must share a shape (give *size*) '''
+		first = self.read(0)
+		out = np.empty((len(self),) + first.shape, np.uint8)
+		out[0] = first
+		for i in range(1, len(self)):
+			im = self.read(i)
+			if im.shape != first.shape:
+				raise ValueError('{} is {}, not {} : give Collection a size'.format(self.files[i], im.shape, first.shape))
+			out[i] = im
+		return out
+
+def load_collection(root, size = None):
+	''' style name -> lazy Collection '''
+	return { name:Collection('{}/{}'.format(root,name), size) for name in label_name }
+
+train = load_collection(train_folder)
+test = load_collection(test_folder)
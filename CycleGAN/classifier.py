@@ -41,10 +41,21 @@ def new_model(compile = True):
 		model.compile(optimizer='RMSProp', loss='categorical_crossentropy' ,metrics=['accuracy'])
 	return model
 
+def fold(model):
+	''' same layers and weights without Dropout (identity at inference), not trainable '''
+	from keras.models import Model
+	from keras.layers import Input,Dropout,InputLayer
+	y = i = Input(model.input_shape[1:])
+	for layer in model.layers:
+		if not isinstance(layer,(Dropout,InputLayer)):
+			y = layer(y)
+	m = Model(i,y,name=model.name)
+	m.trainable = False
+	return m
+
 def dataGenerator(path):
-	from keras.preprocessing import image
-	imG = image.ImageDataGenerator(data_format = 'channels_last')#preprocessing_function not avalible
-	return imG.flow_from_directory(path, class_mode='categorical',target_size = input_shape[:2], batch_size = batch_size)
+	from pipeline import DirectorySequence
+	return DirectorySequence(path, target_size = input_shape[:2], batch_size = batch_size)
 
 def save_model(model):
 	print('saving {}'.format(model_path))
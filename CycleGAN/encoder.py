@@ -48,8 +48,7 @@ def new_G():
 
 def new_model(compile = True):
 	G = new_G()
-	D = classifier.load_model(for_test=True)
-	D.trainable=False
+	D = classifier.fold(classifier.load_model(for_test=True))
 	i = keras.layers.Input(input_shape)
 	GAN = keras.models.Model(i,D(G(i)))
 
@@ -58,15 +57,9 @@ def new_model(compile = True):
 	return GAN,G,D
 
 def dataGenerator(path):
-	from keras.preprocessing import image
-	import numpy as np
-	imG = image.ImageDataGenerator(data_format = 'channels_last')
-	imG = imG.flow_from_directory(path, class_mode='categorical',target_size = input_shape[:2], batch_size = batch_size)
-	while True:
-		images, labels = next(imG) # ([batch_size,img],[batch_size,label one hot])
-		#random_labels = np.eye(number_of_class)[np.random.choice(number_of_class,images.shape[0])]
-		random_labels = np.array([[0,0,1,0,0]]*images.shape[0])
-		yield images, random_labels
+	''' every image is labeled photo '''
+	from pipeline import DirectorySequence
+	return DirectorySequence(path, target_size = input_shape[:2], batch_size = batch_size, target = [0,0,1,0,0])
 
 def save_model(G):
 	print('saving {}'.format(model_path))
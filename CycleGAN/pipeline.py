@@ -0,0 +1,71 @@
+import cv2
+import keras
+import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
+from DirIndex import DirIndex
+
+class DirectorySequence(keras.utils.Sequence):
+	''' flow_from_directory replacement for path/<class>/* (class_mode categorical)
+
+	images are decoded by cv2 on a thread pool (cv2 releases the GIL), resized with
+	nearest like load_img, kept as RGB uint8 in a cache, and returned as float32 in
+	[0,255] ; the order is a fresh permutation per epoch from (seed, epoch), so runs
+	are reproducible ; *target* replaces the labels with one constant vector '''
+	def __init__(self, path, target_size, batch_size, target=None, shuffle=True, seed=0, workers=8, cache=True):
+		self.target_size = tuple(target_size)
+		self.batch_size = batch_size
+		self.shuffle = shuffle
+		self.seed = seed
+		self.epoch = 0
+		self.pool = ThreadPoolExecutor(workers)
+		self.cache = {} if cache else None
+
+		self.classes = sorted(d.name for d in os.scandir(path) if d.is_dir())
+		self.files, labels = [], []
+		for i,name in enumerate(self.classes):
+			files = DirIndex(os.path.join(path,name)).files()
+			self.files += files
+			labels += [i]*len(files)
+		self.labels = np.asarray(labels)
+		print('Found {} images belonging to {} classes.'.format(len(self.files),len(self.classes)))
+
+		if target is None:
+			self.onehot = np.eye(len(self.classes),dtype=np.float32)
+			self.target = None
+		else:
+			self.target = np.tile(np.asarray(target,np.float32),(batch_size,1))
+		self.order = self.permutation()
+
+	def permutation(self):
+		if not self.shuffle:
+			return np.arange(len(self.files))
+		return np.random.default_rng((self.seed,self.epoch)).permutation(len(self.files))
+
+	def __len__(self):
+		return (len(self.files) + self.batch_size - 1) // self.batch_size
+
+	def on_epoch_end(self):
+		self.epoch += 1
+		self.order = self.permutation()
+
+	def imread(self, index):
+		if self.cache is not None and index in self.cache:
+			return self.cache[index]
+		im = cv2.imread(self.files[index])
+		if im is None:
+			raise RuntimeError('{} is not image'.format(self.files[index]))
+		im = cv2.resize(im, dsize=self.target_size[::-1], interpolation=cv2.INTER_NEAREST)
+		im = cv2.cvtColor(im, cv2.COLOR_BGR2RGB)
+		if self.cache is not None:
+			self.cache[index] = im
+		return im
+
+	def __getitem__(self, i):
+		index = self.order[i*self.batch_size:(i+1)*self.batch_size]
+		x = np.empty((len(index),)+self.target_size+(3,), np.float32)
+		for o,im in zip(x, self.pool.map(self.imread, index)):
+			o[...] = im
+		if self.target is not None:
+			return x, self.target[:len(index)]
+		return x, self.onehot[self.labels[index]]
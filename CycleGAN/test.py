@@ -4,13 +4,13 @@ _,G,D = encoder.load_model(True)
 
 zG = encoder.dataGenerator(encoder.test_data_folder)
 
-z,l = next(zG)
+z,l = zG[0]
 for i,(z,p,l) in enumerate(zip(z,D.predict(z),l)):
 	print(p)
 	print(l)
 
 '''
-z = next(zG)[0]
+z = zG[0][0]
 p = G.predict(z)
 d = D.predict(p)
 
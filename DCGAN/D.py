@@ -1,40 +1,74 @@
+import itertools
 import keras
 import numpy as np
 
 
 class NoizyData:
 	'''noizy mnist data'''
-	def __init__(self,y_factor=1.0):
+	def __init__(self,y_factor=1.0,data=None,seed=None):
 		
-		(x,y),(tx,ty) = self.load_mnist()
+		(x,y),(tx,ty) = self.load_mnist() if data is None else data
 		self.x = x
-		self.y = y
+		self.y = y.astype('float32')
 		self.tx = tx
 		self.ty = ty
 		self.sy = y_factor
 		self.noise_mean = 0.0
 		self.noise_sigma = 1.0
-		self.choicepool = np.arange(self.x.shape[0])
+		self.seed = np.random.SeedSequence(seed)
+		self.rng = np.random.default_rng(self.seed.spawn(1)[0])
+
+	def train_generator(self,size,ahead=0,workers=1):
+		'''endless batches, with *ahead* > 0 *workers* threads keep that many batches ready
+		threaded batches live in reused buffers : use each one before pulling *ahead*+1 more
+		(fit_generator with workers=0 does) ; the threads stop when the generator is closed'''
+		if not ahead:
+			while True:
+				yield self.train_batch(size)
+		import queue,threading
+		q = queue.Queue(ahead)
+		stop = threading.Event()
+		def produce(rng):
+			ring = [self.new_batch(size) for _ in range(ahead+2)]
+			for i in itertools.count():
+				batch = self.train_batch(size,rng,ring[i%len(ring)])
+				while not stop.is_set():
+					try:
+						q.put(batch,timeout=0.1)
+						break
+					except queue.Full:
+						pass
+				if stop.is_set():
+					return
+		for s in self.seed.spawn(workers):
+			threading.Thread(target=produce,args=(np.random.default_rng(s),),daemon=True).start()
+		try:
+			while True:
+				yield q.get()
+		finally:
+			stop.set()
 
-	def train_generator(self,size):
-		while True:
-			yield self.train_batch(size)
+	def new_batch(self,size):
+		'''(x, y, scratch) buffers for train_batch'''
+		x = np.empty((size,)+self.x.shape[1:],np.float32)
+		return x,np.empty((size,)+self.y.shape[1:],np.float32),np.empty_like(x)
 
-	def train_batch(self,size):
-		choice = np.random.choice(self.choicepool,size)
-		x = self.x[choice]
-		y = self.y[choice]
+	def train_batch(self,size,rng=None,out=None):
+		'''x/255 + normal noise scaled per sample by u ~ U(0,1), clipped to [0,1]; y softened by (1-u)*sy
+		float32 and in place, into *out* (from new_batch) if given'''
+		rng = rng or self.rng
+		x,y,scratch = out or self.new_batch(size)
 
-		scale = np.random.uniform(size=size)
-		
-		dx = np.random.normal(size=x.shape)
-		dx = dx.reshape((size,-1)) * scale[:,None]
-		dx = dx.reshape(x.shape)
-		
-		sy = (1 - scale)[:,None] * self.sy
+		choice = rng.integers(self.x.shape[0],size=size)
+		scale = rng.random(size,dtype=np.float32)
+
+		rng.standard_normal(dtype=np.float32,out=x)
+		x *= scale.reshape((size,)+(1,)*(x.ndim-1))
+		x += np.multiply(self.x[choice],np.float32(1/255),out=scratch)
+		np.clip(x,0,1,out=x)
 
-		x = np.clip(x + dx,0,1)
-		y = y * sy
+		self.y.take(choice,axis=0,out=y)
+		y *= ((1 - scale) * self.sy)[:,None]
 
 		return x,y
 
@@ -51,9 +85,10 @@ class NoizyData:
 
 	@staticmethod
 	def load_mnist():
-		from keras.datasets import mnist
-		(x_train, y_train), (x_test, y_test) = mnist.load_data()
-		x_train = NoizyData.transform(x_train)
+		import mnist_store
+		train, test = mnist_store.load()
+		(x_train, y_train), (x_test, y_test) = (train.x, train.y), (test.x, test.y)
+		x_train = x_train.reshape(-1,28,28,1) # uint8 view, train_batch converts
 		x_test = NoizyData.transform(x_test)
 		y_train = keras.utils.to_categorical(y_train, 10)
 		y_test = keras.utils.to_categorical(y_test, 10)
@@ -104,11 +139,12 @@ class D:
 	def train(self,data,epochs=200,batch_size=128):
 
 		self.model.fit_generator(
-			data.train_generator(batch_size),
+			data.train_generator(batch_size,ahead=4),
 			steps_per_epoch=data.x.shape[0]//batch_size,
 			epochs=epochs,
 			validation_data=data.test(),
-			shuffle=False # shuffle inside generator
+			shuffle=False, # shuffle inside generator
+			workers=0 # batches come from reused buffers, see train_generator
 			)
 
 if __name__ == "__main__":
@@ -23,12 +23,16 @@ def new_G(input_shape):
 			Activation("sigmoid")])
 
 
+def z_of(labels,length):
+	''' z for the given digit labels : one hot label followed by normal noise '''
+	z = np.random.normal(size=(len(labels),length))
+	z[:,0:10] = np.eye(10)[labels]
+	return z
+
 def z(batch_size,length):
 	def g():
-		answer = np.eye(10)[np.random.choice(10,batch_size)]
-		z = np.random.normal(size=(batch_size,length))
-		z[:,0:10] = answer
-		return z,answer
+		labels = np.random.choice(10,batch_size)
+		return z_of(labels,length),np.eye(10)[labels]
 	while True:
 		yield g()
 
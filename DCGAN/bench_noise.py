@@ -0,0 +1,39 @@
+''' batches/sec of NoizyData.train_batch : the old float64 version vs the in-place float32 one (synthetic mnist-shaped data) '''
+import time
+import numpy as np
+from D import NoizyData
+
+def old_batch(x,y,sy,size):
+	choice = np.random.choice(np.arange(x.shape[0]),size)
+	x = x[choice]
+	y = y[choice]
+	scale = np.random.uniform(size=size)
+	dx = np.random.normal(size=x.shape)
+	dx = dx.reshape((size,-1)) * scale[:,None]
+	dx = dx.reshape(x.shape)
+	sy = (1 - scale)[:,None] * sy
+	return np.clip(x + dx,0,1), y * sy
+
+def rate(next_batch,seconds):
+	n, start = 0, time.perf_counter()
+	while time.perf_counter() - start < seconds:
+		next_batch()
+		n += 1
+	return n / (time.perf_counter() - start)
+
+def main(size=128,seconds=3.0,ahead=4,workers=2):
+	x8 = np.random.randint(0,256,size=(60000,28,28,1),dtype=np.uint8)
+	x = x8.astype('float32')/255 # the old version kept all of mnist as float
+	y = np.eye(10,dtype='float32')[np.random.randint(10,size=60000)]
+	data = NoizyData(data=((x8,y),(x[:10],y[:10])))
+
+	print('batch {}'.format(size))
+	print('old                : {:8.1f} batches/s'.format(rate(lambda: old_batch(x,y,1.0,size),seconds)))
+	print('new                : {:8.1f} batches/s'.format(rate(lambda: data.train_batch(size),seconds)))
+	out = data.new_batch(size)
+	print('new, reused buffer : {:8.1f} batches/s'.format(rate(lambda: data.train_batch(size,out=out),seconds)))
+	g = data.train_generator(size,ahead=ahead,workers=workers)
+	print('new, {} threads     : {:8.1f} batches/s'.format(workers,rate(lambda: next(g),seconds)))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,87 @@
+''' conditional sampling from a trained G
+
+python sample.py -d 3 5 -n 100000 -f npz -o synth   # labelled dataset shards
+python sample.py -n 10 -o o --grid                  # pngs + one grid per digit row
+
+generation runs in large predict batches, outputs are written by a thread pool
+while the next batch is generated, at most a few batches are in flight
+'''
+import collections
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import G
+
+z_len = 20
+
+def labels_for(digits,counts):
+	''' digits repeated by counts (one count for all, or one per digit) '''
+	return np.repeat(np.asarray(digits),np.broadcast_to(counts,(len(digits),)))
+
+def generate(g,labels,batch_size=4096):
+	''' yield (offset, labels, uint8 images (n,28,28)) batch by batch '''
+	for start in range(0,len(labels),batch_size):
+		lab = labels[start:start+batch_size]
+		x = g.predict(G.z_of(lab,z_len),batch_size=batch_size)
+		yield start,lab,np.clip(x.reshape(-1,28,28)*255+0.5,0,255).astype(np.uint8)
+
+def grid(images,cols,margin=1,background=128):
+	''' images (n,h,w) -> one canvas, *cols* per row, *margin* pixels around each image '''
+	n,h,w = images.shape
+	rows = -(-n//cols)
+	cells = np.full((rows*cols,h+margin,w+margin),background,np.uint8)
+	cells[:n,:h,:w] = images
+	canvas = cells.reshape(rows,cols,h+margin,w+margin).transpose(0,2,1,3).reshape(rows*(h+margin),cols*(w+margin))
+	return np.pad(canvas,((margin,0),(margin,0)),'constant',constant_values=background)
+
+def write_pngs(folder,offset,labels,images):
+	import cv2
+	for i,(y,im) in enumerate(zip(labels,images),offset):
+		cv2.imwrite('{}/{}-{}.png'.format(folder,y,i),im)
+
+def write_npz(folder,offset,labels,images):
+	path = '{}/{:010d}.npz'.format(folder,offset)
+	np.savez(path + '.tmp.npz',x=images,y=labels)
+	os.replace(path + '.tmp.npz',path)
+
+def sample(g,labels,folder,format='png',batch_size=4096,workers=4,ahead=4):
+	''' generate images for *labels* into *folder*, returns the first image of each digit '''
+	write = write_pngs if format == 'png' else write_npz
+	first = {}
+	with ThreadPoolExecutor(workers) as pool:
+		pending = collections.deque()
+		for offset,lab,images in generate(g,labels,batch_size):
+			for d in np.unique(lab):
+				first.setdefault(int(d),images[np.argmax(lab==d)])
+			pending.append(pool.submit(write,folder,offset,lab,images))
+			while len(pending) > ahead:
+				pending.popleft().result()
+			print('{}/{}'.format(offset+len(lab),len(labels)),end='\r',flush=True)
+		for p in pending:
+			p.result()
+	print()
+	return first
+
+if __name__ == '__main__':
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-p","--path", default="G.h5", type=str)
+	parser.add_argument("-o","--output", default="o", type=str)
+	parser.add_argument("-d","--digits", default=list(range(10)), type=int, nargs='+')
+	parser.add_argument("-n","--count", default=[10], type=int, nargs='+', help="per digit, one value or one per digit")
+	parser.add_argument("-f","--format", default="png", choices=["png","npz"])
+	parser.add_argument("-b","--batch_size", default=4096, type=int)
+	parser.add_argument("-w","--workers", default=4, type=int)
+	parser.add_argument("--grid", action='store_true', help="also write sample.png, one image per digit")
+	args = parser.parse_args()
+	print(args)
+
+	os.makedirs(args.output,exist_ok=True)
+	g = G.new_G((z_len,))
+	g.load_weights(args.path)
+
+	labels = labels_for(args.digits,args.count)
+	first = sample(g,labels,args.output,args.format,args.batch_size,args.workers)
+	if args.grid:
+		import cv2
+		cv2.imwrite('{}/sample.png'.format(args.output),grid(np.stack([first[d] for d in sorted(first)]),5))
@@ -1,6 +1,7 @@
 import G
 import numpy as np
 import os
+from sample import sample, grid, z_len
 
 import argparse
 parser = argparse.ArgumentParser()
@@ -10,32 +11,16 @@ args = parser.parse_args()
 print(args)
 
 o = args.output
-try:
-	os.makedirs(o)
-except:
-	pass
+os.makedirs(o,exist_ok=True)
 
-g = G.new_G((20,))
+g = G.new_G((z_len,))
 g.load_weights(args.path)
 
-z,y = next(G.z(100,20))
-x = g.predict(z)
+labels = np.random.choice(10,100)
+first = sample(g,labels,o)
 
-sample = [np.zeros((28,28))]*10
+# one sample per digit, missing digits stay blank
+canvas = grid(np.stack([first.get(d,np.zeros((28,28),np.uint8)) for d in range(10)]),5)
 
 import cv2
-for i,(p,y) in enumerate(zip(x,y)):
-	y = int(np.dot(y,np.arange(10)))
-	p = p.reshape(28,28)*255
-	sample[y] = p
-	cv2.imwrite('{}/{}-{}.png'.format(o,y,i),p)
-
-margin = 1
-canvas = np.ones((28*2+3,28*5+6),np.uint8)*128
-for i,im in enumerate(sample):
-	nx = i//5
-	ny = i%5
-	x = nx*29+1
-	y = ny*29+1
-	canvas[x:x+28,y:y+28]=im
-	cv2.imwrite('{}/sample.png'.format(o),canvas)
\ No newline at end of file
+cv2.imwrite('{}/sample.png'.format(o),canvas)
@@ -0,0 +1,180 @@
+''' CPU-only training throughput benchmark for every project in this repo
+
+python benchmark.py                      # all cases, JSON to stdout
+python benchmark.py -s 32 -b 8 -o a.json # reduced resolution, save for comparing commits
+
+each case runs in its own process (projects import siblings by bare name, and
+peak RSS should not leak between cases), builds the model at --size, feeds
+synthetic data and reports steps/sec, samples/sec, data-loading share and peak RSS
+'''
+import json
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.abspath(__file__))
+
+def crossgan_autoencoder(size, batch_size):
+	import numpy as np
+	from AutoEncoder import AutoEncoder
+	a = AutoEncoder('bench', size)
+	a.autoencoder.compile(optimizer='rmsprop', loss='mse')
+	def data():
+		return np.random.uniform(size=(batch_size,)+a.ioshape).astype('float32')
+	def step(x):
+		a.autoencoder.train_on_batch(x, x)
+	return data, step
+
+def crossgan_cyclegan(size, batch_size):
+	import numpy as np
+	from cyclegan import CycleGAN
+	gan = CycleGAN(img_size=size)
+	valid = np.ones((batch_size,) + gan.disc_patch)
+	fake = np.zeros((batch_size,) + gan.disc_patch)
+	def data():
+		return np.random.uniform(-1, 1, size=(2,batch_size)+gan.img_shape).astype('float32')
+	def step(x):
+		imgs_A, imgs_B = x
+		fake_B = gan.g_AB.predict(imgs_A)
+		fake_A = gan.g_BA.predict(imgs_B)
+		gan.d_A.train_on_batch(imgs_A, valid)
+		gan.d_A.train_on_batch(fake_A, fake)
+		gan.d_B.train_on_batch(imgs_B, valid)
+		gan.d_B.train_on_batch(fake_B, fake)
+		gan.combined.train_on_batch([imgs_A, imgs_B], [valid, valid, imgs_A, imgs_B, imgs_A, imgs_B])
+	return data, step
+
+def crossencoder(size, batch_size):
+	''' MNIST sized, *size* is ignored '''
+	import numpy as np
+	from keras.models import Model
+	from keras.layers import Input
+	from model import Encoder, Decoder, input_shape
+	i = Input(input_shape)
+	m = Model(i, Decoder()(Encoder()(i)))
+	m.compile(optimizer='RMSProp', loss='mse')
+	def data():
+		return np.random.uniform(size=(batch_size,)+input_shape).astype('float32')
+	def step(x):
+		m.train_on_batch(x, x)
+	return data, step
+
+def cyclegan_encoder(size, batch_size):
+	import numpy as np
+	import encoder
+	encoder.input_shape = (size, size, 3)
+	G = encoder.new_G()
+	G.compile(optimizer='RMSProp', loss='mse')
+	def data():
+		return np.random.randint(0, 256, size=(batch_size,)+encoder.input_shape).astype('float32')
+	def step(x):
+		G.train_on_batch(x, x)
+	return data, step
+
+def dcgan(size, batch_size):
+	''' MNIST sized, *size* is ignored '''
+	from keras.models import Model
+	from keras.layers import Input
+	import G
+	from D import D
+	z_len = 20
+	g = G.new_G((z_len,))
+	d = D().model
+	d.trainable = False
+	i = Input((z_len,))
+	m = Model(i, d(g(i)))
+	m.compile(optimizer='adadelta', loss='mse')
+	z = G.z(batch_size, z_len)
+	def data():
+		return next(z)
+	def step(x):
+		m.train_on_batch(*x)
+	return data, step
+
+cases = {
+	'crossgan_autoencoder': ('CrossGAN', crossgan_autoencoder),
+	'crossgan_cyclegan': ('CrossGAN', crossgan_cyclegan),
+	'crossencoder': ('CrossEncoder', crossencoder),
+	'cyclegan_encoder': ('CycleGAN', cyclegan_encoder),
+	'dcgan': ('DCGAN', dcgan),
+}
+
+def run(name, size, batch_size, steps, warmup):
+	''' run one case in this process, return a result dict '''
+	import resource
+	folder, build = cases[name]
+	sys.path.insert(0, os.path.join(root, folder))
+	os.chdir(os.path.join(root, folder))
+
+	start = time.perf_counter()
+	data, step = build(size, batch_size)
+	build_time = time.perf_counter() - start
+
+	for _ in range(warmup):
+		step(data())
+
+	data_time = 0.0
+	start = time.perf_counter()
+	for _ in range(steps):
+		t = time.perf_counter()
+		x = data()
+		data_time += time.perf_counter() - t
+		step(x)
+	total = time.perf_counter() - start
+
+	return {
+		'case': name,
+		'size': size,
+		'batch_size': batch_size,
+		'steps': steps,
+		'build_sec': build_time,
+		'steps_per_sec': steps / total,
+		'samples_per_sec': steps * batch_size / total,
+		'data_share': data_time / total,
+		'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+	}
+
+def commit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main():
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-c","--cases", nargs='*', default=list(cases), choices=list(cases))
+	parser.add_argument("-s","--size", default=32, type=int)
+	parser.add_argument("-b","--batch_size", default=8, type=int)
+	parser.add_argument("-n","--steps", default=20, type=int)
+	parser.add_argument("-w","--warmup", default=2, type=int)
+	parser.add_argument("-o","--output", default=None, type=str)
+	parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.run:
+		print(json.dumps(run(args.run, args.size, args.batch_size, args.steps, args.warmup)))
+		return
+
+	env = dict(os.environ, CUDA_VISIBLE_DEVICES='')
+	results = []
+	for name in args.cases:
+		print('running {} ...'.format(name), file=sys.stderr, flush=True)
+		cmd = [sys.executable, os.path.abspath(__file__), '--run', name,
+			'-s', str(args.size), '-b', str(args.batch_size), '-n', str(args.steps), '-w', str(args.warmup)]
+		p = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		if p.returncode == 0:
+			results.append(json.loads(p.stdout.decode().strip().splitlines()[-1]))
+		else:
+			err = p.stderr.decode().strip().splitlines()
+			results.append({'case': name, 'error': err[-1] if err else 'exit {}'.format(p.returncode)})
+
+	report = json.dumps({'commit': commit(), 'results': results}, indent=1)
+	if args.output:
+		with open(args.output, 'w') as f:
+			f.write(report)
+	print(report)
+
+if __name__ == '__main__':
+	main()
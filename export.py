@@ -0,0 +1,100 @@
+''' export trained generators to frozen, inference-only TensorFlow graphs (.pb), served by inference.py
+
+python export.py crossencoder CrossEncoder/M35.h5 M35.pb
+python export.py dcgan DCGAN/G.h5 G.pb
+python export.py cyclegan CycleGAN/xphoto_G.h5 xphoto_G.pb
+python export.py crossgan_ab CrossGAN gab.pb        # folder with ukiyoe.h5 / photo.h5
+
+the graph is built with learning phase 0 (Dropout gone), variables become
+constants and training-only nodes are stripped ; when inference.py loads it,
+TF's graph optimizer folds the constant Lambda scalings and fuses
+conv + bias + activation, and nothing from keras is imported
+'''
+import json
+import os
+import sys
+
+root = os.path.dirname(os.path.abspath(__file__))
+
+def use(project):
+	sys.path.insert(0, os.path.join(root, project))
+
+def crossencoder(path):
+	''' full model saved by CrossEncoder/main.py (M<a><b>.h5) '''
+	use('CrossEncoder')
+	import keras
+	return keras.models.load_model(path, compile=False)
+
+def dcgan(path):
+	use('DCGAN')
+	import G
+	g = G.new_G((20,))
+	g.load_weights(path)
+	return g
+
+def cyclegan(path):
+	use('CycleGAN')
+	import encoder
+	g = encoder.new_G()
+	g.load_weights(path)
+	return g
+
+def crossgan(direction):
+	def build(path):
+		use('CrossGAN')
+		os.chdir(path)
+		import translate
+		return translate.load_translator(direction)
+	return build
+
+builders = {
+	'crossencoder': crossencoder,
+	'dcgan': dcgan,
+	'cyclegan': cyclegan,
+	'crossgan_ab': crossgan('ab'),
+	'crossgan_ba': crossgan('ba'),
+}
+
+def tf1():
+	import tensorflow
+	return getattr(getattr(tensorflow, 'compat', None), 'v1', tensorflow)
+
+def freeze(model, path):
+	''' write model as a frozen GraphDef to *path*, and its tensor names / shapes to *path*.json '''
+	tf = tf1()
+	from keras import backend as K
+	sess = K.get_session()
+	outputs = [o.op.name for o in model.outputs]
+	graph_def = tf.graph_util.convert_variables_to_constants(sess, sess.graph.as_graph_def(), outputs)
+	graph_def = tf.graph_util.remove_training_nodes(graph_def, protected_nodes=outputs)
+
+	meta = {
+		'input': model.input.name,
+		'output': model.output.name,
+		'input_shape': list(model.input_shape[1:]),
+		'output_shape': list(model.output_shape[1:]),
+	}
+	tmp = '{}.{}.tmp'.format(path, os.getpid())
+	with open(tmp, 'wb') as f:
+		f.write(graph_def.SerializeToString())
+	os.replace(tmp, path)
+	with open(path + '.json', 'w') as f:
+		json.dump(meta, f, indent=1)
+	print('exported {} : {} nodes, {} -> {}'.format(path, len(graph_def.node), meta['input'], meta['output']))
+
+def main():
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("kind", choices=list(builders))
+	parser.add_argument("weights", type=str)
+	parser.add_argument("output", type=str)
+	args = parser.parse_args()
+
+	weights, output = os.path.abspath(args.weights), os.path.abspath(args.output)
+	from keras import backend as K
+	K.set_learning_phase(0) # before building, so Dropout is left out of the graph
+	model = builders[args.kind](weights)
+	freeze(model, output)
+
+if __name__ == '__main__':
+	main()
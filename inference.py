@@ -0,0 +1,36 @@
+''' serve a graph written by export.py : only tensorflow is imported, no keras or model code
+
+m = FrozenModel('M35.pb')
+y = m.predict(x)
+'''
+import json
+import numpy as np
+
+class FrozenModel:
+	def __init__(self, path, threads=0, warmup=True):
+		''' *threads* : intra-op threads, 0 lets TF decide '''
+		import tensorflow
+		tf = getattr(getattr(tensorflow, 'compat', None), 'v1', tensorflow)
+		with open(path + '.json') as f:
+			self.meta = json.load(f)
+		graph_def = tf.GraphDef()
+		with open(path, 'rb') as f:
+			graph_def.ParseFromString(f.read())
+
+		graph = tf.Graph()
+		with graph.as_default():
+			tf.import_graph_def(graph_def, name='')
+		config = tf.ConfigProto(intra_op_parallelism_threads=threads, inter_op_parallelism_threads=1)
+		self.session = tf.Session(graph=graph, config=config)
+		x = graph.get_tensor_by_name(self.meta['input'])
+		y = graph.get_tensor_by_name(self.meta['output'])
+		self._run = self.session.make_callable(y, [x]) # skips per-call feed/fetch setup
+		self.input_shape = tuple(self.meta['input_shape'])
+		if warmup:
+			self.predict(np.zeros((1,) + self.input_shape, np.float32))
+
+	def predict(self, x):
+		return self._run(np.asarray(x, np.float32))
+
+	def close(self):
+		self.session.close()
@@ -0,0 +1,83 @@
+''' load generator for serve.py : concurrent clients on localhost, client-side latency and throughput as JSON
+
+python loadgen.py gab -c 32 -d 10
+'''
+import http.client
+import io
+import json
+import threading
+import time
+import numpy as np
+
+def request(host, port, method, path, body=None):
+	c = http.client.HTTPConnection(host, port)
+	c.request(method, path, body)
+	r = c.getresponse()
+	data = r.read()
+	c.close()
+	if r.status != 200:
+		raise RuntimeError('{} {} : {} {}'.format(method, path, r.status, data[:200]))
+	return data
+
+def main():
+	import argparse
+	parser = argparse.ArgumentParser()
+	parser.add_argument("model", type=str)
+	parser.add_argument("--host", default="127.0.0.1", type=str)
+	parser.add_argument("-p","--port", default=8000, type=int)
+	parser.add_argument("-c","--concurrency", default=16, type=int)
+	parser.add_argument("-d","--duration", default=10.0, type=float)
+	parser.add_argument("-b","--batch", default=1, type=int, help="samples per request")
+	args = parser.parse_args()
+
+	meta = json.loads(request(args.host, args.port, 'GET', '/models'))[args.model]
+	shape = tuple(meta['input_shape'])
+	x = np.random.uniform(size=(args.batch,)+shape if args.batch > 1 else shape).astype(np.float32)
+	buf = io.BytesIO()
+	np.save(buf, x)
+	body = buf.getvalue()
+
+	latencies, errors = [], []
+	stop = time.perf_counter() + args.duration
+	def client():
+		c = http.client.HTTPConnection(args.host, args.port)
+		while time.perf_counter() < stop:
+			t = time.perf_counter()
+			try:
+				c.request('POST', '/predict/' + args.model, body)
+				r = c.getresponse()
+				r.read()
+				if r.status != 200:
+					errors.append(r.status)
+					continue
+			except (OSError, http.client.HTTPException) as e:
+				errors.append(str(e))
+				c = http.client.HTTPConnection(args.host, args.port)
+				continue
+			latencies.append(time.perf_counter() - t)
+		c.close()
+
+	threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+	start = time.perf_counter()
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	elapsed = time.perf_counter() - start
+
+	lat = np.asarray(latencies) * 1000
+	report = {
+		'model': args.model,
+		'concurrency': args.concurrency,
+		'requests': len(lat),
+		'errors': len(errors),
+		'requests_per_sec': len(lat) / elapsed,
+		'samples_per_sec': len(lat) * args.batch / elapsed,
+		'p50_ms': float(np.percentile(lat, 50)) if len(lat) else None,
+		'p99_ms': float(np.percentile(lat, 99)) if len(lat) else None,
+		'server': json.loads(request(args.host, args.port, 'GET', '/metrics'))[args.model],
+	}
+	print(json.dumps(report, indent=1))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,190 @@
+''' local HTTP server for exported generators, with dynamic batching
+
+python serve.py -m gab=gab.pb -m G=G.pb --max_batch 64 --max_wait_ms 5
+
+POST /predict/<name>   body and reply : one .npy array (a single sample or a batch)
+GET  /models           input / output shapes
+GET  /metrics          latency p50 / p99 and batch sizes per model
+
+requests for a model queue up ; a worker takes the first one, waits at most
+max_wait_ms for more (up to max_batch samples), runs one predict for all of
+them and hands each caller its slice. a request with more than max_batch samples
+is split, one of the wrong shape is answered 400 before it is queued.
+loadgen.py is the matching client
+'''
+import collections
+import io
+import json
+import queue
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Request:
+	def __init__(self, x):
+		self.x = x
+		self.start = time.perf_counter()
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+
+class Batcher:
+	''' dynamic batching in front of model.predict '''
+	def __init__(self, model, max_batch=64, max_wait=0.005, history=10000):
+		self.model = model
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		self.queue = queue.Queue()
+		self.carry = None # request that did not fit in the previous batch
+		self.latencies = collections.deque(maxlen=history)
+		self.batch_sizes = collections.deque(maxlen=history)
+		threading.Thread(target=self._run, daemon=True).start()
+
+	def check(self, x):
+		''' why *x* can not be batched with the others, None if it can '''
+		shape = tuple(self.model.input_shape)
+		if x.ndim not in (len(shape), len(shape) + 1) or x.shape[x.ndim-len(shape):] != shape:
+			return 'input shape {} does not match {} or (n,)+{}'.format(x.shape, shape, shape)
+		if not np.issubdtype(x.dtype, np.number):
+			return 'input dtype {} is not numeric'.format(x.dtype)
+		return None
+
+	def predict(self, x):
+		''' blocks until the batches containing *x* are done, *x* is split into
+		parts of at most max_batch samples '''
+		x = np.asarray(x, np.float32)
+		reqs = [Request(x[i:i+self.max_batch]) for i in range(0, len(x), self.max_batch)]
+		for r in reqs:
+			self.queue.put(r)
+		for r in reqs:
+			r.done.wait()
+		for r in reqs:
+			if r.error is not None:
+				raise r.error
+		return np.concatenate([r.result for r in reqs]) if len(reqs) > 1 else reqs[0].result
+
+	def _collect(self):
+		''' requests for one batch of at most max_batch samples (one request is never larger) '''
+		if self.carry is not None:
+			reqs, self.carry = [self.carry], None
+		else:
+			reqs = [self.queue.get()]
+		n = len(reqs[0].x)
+		deadline = reqs[0].start + self.max_wait
+		while n < self.max_batch:
+			timeout = deadline - time.perf_counter()
+			try: # past the deadline, still take what is already queued
+				r = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+			except queue.Empty:
+				break
+			if n + len(r.x) > self.max_batch:
+				self.carry = r
+				break
+			reqs.append(r)
+			n += len(r.x)
+		return reqs, n
+
+	def _run(self):
+		while True:
+			reqs, n = self._collect()
+			try:
+				y = self.model.predict(np.concatenate([r.x for r in reqs]))
+				for r,part in zip(reqs, np.split(y, np.cumsum([len(r.x) for r in reqs])[:-1])):
+					r.result = part
+			except Exception as e:
+				for r in reqs:
+					r.error = e
+			end = time.perf_counter()
+			self.batch_sizes.append(n)
+			for r in reqs:
+				self.latencies.append(end - r.start)
+				r.done.set()
+
+	def metrics(self):
+		lat = np.asarray(self.latencies) * 1000
+		sizes = np.asarray(self.batch_sizes)
+		if not len(lat):
+			return {'requests': 0}
+		return {
+			'requests': len(lat),
+			'p50_ms': float(np.percentile(lat, 50)),
+			'p99_ms': float(np.percentile(lat, 99)),
+			'batches': len(sizes),
+			'mean_batch': float(sizes.mean()),
+			'max_batch': int(sizes.max()),
+		}
+
+class Handler(BaseHTTPRequestHandler):
+	batchers = {}
+
+	def log_message(self, *args):
+		pass
+
+	def reply(self, code, body, content_type='application/json'):
+		self.send_response(code)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def reply_json(self, code, obj):
+		self.reply(code, json.dumps(obj).encode())
+
+	def do_GET(self):
+		if self.path == '/metrics':
+			self.reply_json(200, {name: b.metrics() for name,b in self.batchers.items()})
+		elif self.path == '/models':
+			self.reply_json(200, {name: b.model.meta for name,b in self.batchers.items()})
+		else:
+			self.reply_json(404, {'error': 'not found'})
+
+	def do_POST(self):
+		name = self.path[len('/predict/'):] if self.path.startswith('/predict/') else None
+		if name not in self.batchers:
+			return self.reply_json(404, {'error': 'unknown model {}'.format(name)})
+		b = self.batchers[name]
+		try:
+			x = np.load(io.BytesIO(self.rfile.read(int(self.headers['Content-Length']))), allow_pickle=False)
+		except (ValueError, TypeError, OSError) as e:
+			return self.reply_json(400, {'error': str(e)})
+		error = b.check(x)
+		if error is not None:
+			return self.reply_json(400, {'error': error})
+		single = x.ndim == len(b.model.input_shape)
+		if not len(x):
+			return self.reply_json(400, {'error': 'empty batch'})
+		try:
+			y = b.predict(x[None] if single else x)
+		except Exception as e:
+			return self.reply_json(500, {'error': str(e)})
+		out = io.BytesIO()
+		np.save(out, y[0] if single else y)
+		self.reply(200, out.getvalue(), 'application/octet-stream')
+
+def main():
+	import argparse
+	from inference import FrozenModel
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-m","--model", action='append', required=True, help="name=path.pb, from export.py")
+	parser.add_argument("--host", default="127.0.0.1", type=str)
+	parser.add_argument("-p","--port", default=8000, type=int)
+	parser.add_argument("--max_batch", default=64, type=int)
+	parser.add_argument("--max_wait_ms", default=5.0, type=float)
+	args = parser.parse_args()
+	print(args)
+
+	for spec in args.model:
+		name, path = spec.split('=', 1)
+		print('loading {} from {} ...'.format(name, path))
+		Handler.batchers[name] = Batcher(FrozenModel(path), args.max_batch, args.max_wait_ms / 1000)
+
+	server = ThreadingHTTPServer((args.host, args.port), Handler)
+	print('serving on http://{}:{}'.format(args.host, args.port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+if __name__ == '__main__':
+	main()